@@ -1,6 +1,13 @@
 # diet_api/admin.py
-from django.contrib import admin
-from .models import FoodFormula, ScheduledItemTemplate, DietItem
+import datetime
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import FoodFormula, ScheduledItemTemplate, DietItem, DietDayArchive
+from .cache import bump_date_versions
 
 @admin.register(FoodFormula)
 class FoodFormulaAdmin(admin.ModelAdmin):
@@ -20,12 +27,148 @@ class ScheduledItemTemplateAdmin(admin.ModelAdmin):
     get_display_name.short_description = 'Food/Formula Name'
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    On PostgreSQL, uses the planner's row estimate (pg_class.reltuples) for the
+    unfiltered changelist instead of COUNT(*), which scans the whole table.
+    Filtered lists (and other databases) still get an exact count.
+    """
+    ESTIMATE_MIN_ROWS = 100000 # Below this, an exact count is cheap enough
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.ESTIMATE_MIN_ROWS:
+                return row[0]
+        return super().count
+
+
+class ScheduledDateRangeFilter(admin.SimpleListFilter):
+    """Fixed date ranges (index range scans) instead of listing every distinct date."""
+    title = 'scheduled date'
+    parameter_name = 'scheduled'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('today', 'Today'),
+            ('tomorrow', 'Tomorrow'),
+            ('next_7_days', 'Next 7 days'),
+            ('past_7_days', 'Past 7 days'),
+            ('past_30_days', 'Past 30 days'),
+            ('past_year', 'Past year'),
+            ('older', 'Older than a year'),
+        )
+
+    def queryset(self, request, queryset):
+        today = timezone.localdate()
+        day = datetime.timedelta(days=1)
+        ranges = {
+            'today': (today, today),
+            'tomorrow': (today + day, today + day),
+            'next_7_days': (today, today + 6 * day),
+            'past_7_days': (today - 6 * day, today),
+            'past_30_days': (today - 29 * day, today),
+            'past_year': (today - 364 * day, today),
+        }
+        if self.value() == 'older':
+            return queryset.filter(scheduled_date__lt=today - 364 * day)
+        if self.value() in ranges:
+            start, end = ranges[self.value()]
+            return queryset.filter(scheduled_date__gte=start, scheduled_date__lte=end)
+        return queryset
+
+
+class TimeOfDayFilter(admin.SimpleListFilter):
+    """Time-of-day ranges instead of a DISTINCT scan over every stored timing."""
+    title = 'time of day'
+    parameter_name = 'time_of_day'
+    RANGES = {
+        'night': (datetime.time(0, 0), datetime.time(6, 0)),
+        'morning': (datetime.time(6, 0), datetime.time(12, 0)),
+        'afternoon': (datetime.time(12, 0), datetime.time(18, 0)),
+        'evening': (datetime.time(18, 0), None),
+    }
+
+    def lookups(self, request, model_admin):
+        return (
+            ('night', 'Night (00-06)'),
+            ('morning', 'Morning (06-12)'),
+            ('afternoon', 'Afternoon (12-18)'),
+            ('evening', 'Evening (18-24)'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.RANGES:
+            return queryset
+        start, end = self.RANGES[self.value()]
+        queryset = queryset.filter(timing__gte=start)
+        return queryset.filter(timing__lt=end) if end else queryset
+
+
 @admin.register(DietItem)
 class DietItemAdmin(admin.ModelAdmin):
     list_display = ('food_name', 'scheduled_date', 'timing', 'quantity_ml', 'is_administered', 'is_skipped', 'source_template')
-    list_filter = ('scheduled_date', 'is_administered', 'is_skipped', 'timing')
-    search_fields = ('food_name', 'description', 'source_template__custom_food_name', 'source_formula__name')
+    list_filter = (ScheduledDateRangeFilter, 'is_administered', 'is_skipped', TimeOfDayFilter)
+    list_select_related = ('source_template__food_formula',) # source_template's __str__ uses the formula name
+    # Prefix-only search on one column, backed by dietitem_food_name_prefix_idx (migration 0004)
+    search_fields = ('^food_name',)
+    search_help_text = 'Search by the start of the food name.'
     readonly_fields = ('administered_at', 'created_at', 'updated_at')
-    list_editable = ('is_administered', 'is_skipped') # Allow quick status changes in admin list view
-    date_hierarchy = 'scheduled_date' # Add date navigation bar
-    autocomplete_fields = ['source_template', 'source_formula']
\ No newline at end of file
+    ordering = ('-scheduled_date', '-timing') # Newest first, walks the (scheduled_date, timing) index
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False # Skip the second COUNT(*) on filtered lists
+    autocomplete_fields = ['source_template', 'source_formula']
+    actions = ['mark_administered', 'mark_skipped', 'mark_pending']
+
+    # Status changes are set-based UPDATEs over the selection (replaces list_editable,
+    # which built and saved a form per row). Same rules as the API's mark-* actions.
+    def _update_status(self, request, queryset, label, **values):
+        # update() sends no signals, so invalidate cached data for the affected dates here
+        dates = list(queryset.order_by().values_list('scheduled_date', flat=True).distinct())
+        updated = queryset.update(updated_at=timezone.now(), version=F('version') + 1, **values)
+        bump_date_versions(dates)
+        self.message_user(request, f"Marked {updated} item(s) as {label}.", messages.SUCCESS)
+
+    @admin.action(description='Mark selected items as administered')
+    def mark_administered(self, request, queryset):
+        skipped = queryset.filter(is_skipped=True).count()
+        self._update_status(request, queryset.filter(is_skipped=False), 'administered',
+                            is_administered=True, administered_at=timezone.now())
+        if skipped:
+            self.message_user(request, f"{skipped} skipped item(s) were left unchanged.", messages.WARNING)
+
+    @admin.action(description='Mark selected items as skipped')
+    def mark_skipped(self, request, queryset):
+        administered = queryset.filter(is_administered=True).count()
+        self._update_status(request, queryset.filter(is_administered=False), 'skipped',
+                            is_skipped=True, administered_at=None)
+        if administered:
+            self.message_user(request, f"{administered} administered item(s) were left unchanged.", messages.WARNING)
+
+    @admin.action(description='Reset selected items to pending')
+    def mark_pending(self, request, queryset):
+        self._update_status(request, queryset, 'pending',
+                            is_administered=False, is_skipped=False, administered_at=None)
+
+
+@admin.register(DietDayArchive)
+class DietDayArchiveAdmin(admin.ModelAdmin):
+    # Written only by `manage.py archive_diet_items`
+    list_display = ('scheduled_date', 'item_count', 'administered_count', 'skipped_count', 'consumed_calories', 'archived_at')
+    exclude = ('payload',)
+    ordering = ('-scheduled_date',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
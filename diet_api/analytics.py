@@ -0,0 +1,182 @@
+# diet_api/analytics.py
+"""
+Nutrition trend analytics over a date range.
+
+DietItem rows (and, for archived days, DietDayArchive aggregates) are
+pulled as columns with values_list and every metric is computed with
+whole-array NumPy passes: rows are mapped to bucket indices once, then
+each total is a single np.bincount. Results are cached per
+(range, bucket, window) and keyed on the per-date versions from cache.py,
+so any DietItem write inside the range invalidates them.
+"""
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .cache import get_versions_digest
+from .models import DietItem, DietDayArchive
+from .sync import date_range
+
+BUCKETS = ('day', 'week', 'month')
+NUTRIENTS = ('quantity_ml', 'calories', 'protein_g', 'carbs_g', 'fat_g')
+# Default trailing window (in buckets) for rolling averages
+DEFAULT_WINDOWS = {'day': 7, 'week': 4, 'month': 3}
+
+
+def load_item_columns(start, end):
+    """
+    Item-level columns for [start, end]. Each row counts as one planned item;
+    'consumed' nutrients are the planned ones for administered items, else 0.
+    """
+    rows = list(
+        DietItem.objects.filter(scheduled_date__gte=start, scheduled_date__lte=end)
+        .order_by()
+        .values_list(
+            'scheduled_date', 'is_administered', 'is_skipped',
+            # Null nutrients count as 0; cast in the DB so NumPy gets plain floats
+            *[Coalesce(Cast(name, FloatField()), Value(0.0)) for name in NUTRIENTS],
+        )
+    )
+    columns = list(zip(*rows)) if rows else [()] * (3 + len(NUTRIENTS))
+    administered = np.array(columns[1], dtype=bool)
+    planned = {name: np.array(col, dtype=float) for name, col in zip(NUTRIENTS, columns[3:])}
+    return {
+        'dates': np.array(columns[0], dtype='datetime64[D]'),
+        'count': np.ones(len(rows)),
+        'administered': administered.astype(float),
+        'skipped': np.array(columns[2], dtype=bool).astype(float),
+        'planned': planned,
+        'consumed': {name: np.where(administered, col, 0.0) for name, col in planned.items()},
+    }
+
+
+def load_archive_columns(start, end):
+    """Same columns for archived days: one pre-aggregated row per day from DietDayArchive."""
+    fields = ['scheduled_date', 'item_count', 'administered_count', 'skipped_count']
+    fields += [f'planned_{name}' for name in NUTRIENTS] + [f'consumed_{name}' for name in NUTRIENTS]
+    rows = list(
+        DietDayArchive.objects.filter(scheduled_date__gte=start, scheduled_date__lte=end)
+        .order_by().values_list(*fields)
+    )
+    columns = list(zip(*rows)) if rows else [()] * len(fields)
+    return {
+        'dates': np.array(columns[0], dtype='datetime64[D]'),
+        'count': np.array(columns[1], dtype=float),
+        'administered': np.array(columns[2], dtype=float),
+        'skipped': np.array(columns[3], dtype=float),
+        'planned': {name: np.array(col, dtype=float) for name, col in zip(NUTRIENTS, columns[4:9])},
+        'consumed': {name: np.array(col, dtype=float) for name, col in zip(NUTRIENTS, columns[9:14])},
+    }
+
+
+def load_columns(start, end):
+    """Hot items plus archived day aggregates; bincount sums them alike."""
+    hot, cold = load_item_columns(start, end), load_archive_columns(start, end)
+    merged = {key: np.concatenate((hot[key], cold[key])) for key in ('dates', 'count', 'administered', 'skipped')}
+    for key in ('planned', 'consumed'):
+        merged[key] = {name: np.concatenate((hot[key][name], cold[key][name])) for name in NUTRIENTS}
+    return merged
+
+
+def _bucket_index(dates, start, end, bucket):
+    """Maps each date to its bucket number; returns (indices, bucket start dates)."""
+    if bucket == 'day':
+        origin = np.datetime64(start, 'D')
+        indices = (dates - origin).astype(np.int64)
+        labels = date_range(start, end)
+    elif bucket == 'week':
+        # ISO weeks starting on Monday
+        week_start = start - datetime.timedelta(days=start.weekday())
+        indices = (dates - np.datetime64(week_start, 'D')).astype(np.int64) // 7
+        labels = date_range(week_start, end)[::7]
+    else:
+        origin = np.datetime64(start, 'M')
+        indices = (dates.astype('datetime64[M]') - origin).astype(np.int64)
+        months = np.arange(origin, np.datetime64(end, 'M') + 1)
+        labels = months.astype('datetime64[D]').astype(object).tolist()
+    return indices, labels
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _rolling_mean(values, window):
+    """Trailing mean over `window` buckets, ignoring NaN buckets (cumulative-sum trick)."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    upper = np.arange(1, len(values) + 1)
+    lower = np.maximum(upper - window, 0)
+    return _ratio(sums[upper] - sums[lower], (counts[upper] - counts[lower]).astype(float))
+
+
+def _to_list(values, digits=2):
+    # NaN (no items in the bucket) -> None in the JSON
+    return [None if np.isnan(v) else v for v in np.round(values, digits).tolist()]
+
+
+def compute_nutrition_trends(columns, start, end, bucket, window):
+    indices, labels = _bucket_index(columns['dates'], start, end, bucket)
+    size = len(labels)
+
+    def total(weights):
+        return np.bincount(indices, weights=weights, minlength=size)[:size]
+
+    planned_items = total(columns['count'])
+    administered_items = total(columns['administered'])
+    skipped_items = total(columns['skipped'])
+    planned = {name: total(col) for name, col in columns['planned'].items()}
+    consumed = {name: total(col) for name, col in columns['consumed'].items()}
+
+    adherence = _ratio(administered_items, planned_items)
+    calorie_adherence = _ratio(consumed['calories'], planned['calories'])
+    skipped_rate = _ratio(skipped_items, planned_items)
+    # Rolling averages only over buckets that had items
+    consumed_calories = np.where(planned_items > 0, consumed['calories'], np.nan)
+
+    series = {
+        'start': labels,
+        'items_planned': planned_items.astype(np.int64).tolist(),
+        'items_administered': administered_items.astype(np.int64).tolist(),
+        'items_skipped': skipped_items.astype(np.int64).tolist(),
+        'adherence': _to_list(adherence, 4),
+        'calorie_adherence': _to_list(calorie_adherence, 4),
+        'skipped_rate': _to_list(skipped_rate, 4),
+        'rolling_adherence': _to_list(_rolling_mean(adherence, window), 4),
+        'rolling_consumed_calories': _to_list(_rolling_mean(consumed_calories, window)),
+        **{f'planned_{name}': _to_list(values) for name, values in planned.items()},
+        **{f'consumed_{name}': _to_list(values) for name, values in consumed.items()},
+    }
+    # Row-per-bucket output, built from the column lists in one pass
+    names = list(series)
+    buckets = [dict(zip(names, row)) for row in zip(*series.values())]
+
+    all_planned, all_administered = planned_items.sum(), administered_items.sum()
+    totals = {
+        'items_planned': int(all_planned),
+        'items_administered': int(all_administered),
+        'items_skipped': int(skipped_items.sum()),
+        'adherence': round(float(all_administered / all_planned), 4) if all_planned else None,
+        'skipped_rate': round(float(skipped_items.sum() / all_planned), 4) if all_planned else None,
+        **{f'planned_{name}': round(float(values.sum()), 2) for name, values in planned.items()},
+        **{f'consumed_{name}': round(float(values.sum()), 2) for name, values in consumed.items()},
+    }
+    return {'start': start, 'end': end, 'bucket': bucket, 'window': window, 'totals': totals, 'buckets': buckets}
+
+
+def nutrition_trends(start, end, bucket, window=None):
+    """Cached entry point used by the analytics endpoint."""
+    window = window or DEFAULT_WINDOWS[bucket]
+    digest = get_versions_digest(date_range(start, end))
+    cache_key = f"analytics:nutrition:{start}:{end}:{bucket}:{window}:{digest}"
+    result = cache.get(cache_key)
+    if result is None:
+        result = compute_nutrition_trends(load_columns(start, end), start, end, bucket, window)
+        cache.set(cache_key, result, timeout=getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 60 * 60))
+    return result
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DietApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'diet_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects cache invalidation receivers)
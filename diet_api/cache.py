@@ -0,0 +1,129 @@
+# diet_api/cache.py
+"""
+Per-date cache versioning for DietItem-derived data.
+
+Every scheduled_date has a random version token in the shared version
+cache (settings.VERSION_CACHE_ALIAS), which every worker process sees.
+Anything cached from a date's items (analytics, list payloads) includes
+the token(s) in its key, and any write to a date replaces its token, so
+stale entries are never read again, in any worker, and simply age out of
+the per-process LRU cache. Tokens are random rather than counters so an
+evicted token can never collide with an old one.
+
+A date nobody has written to yet has no token of its own: it uses the
+shared epoch token, so reading versions for a long range is one cache read
+and never writes. Clearing the version cache starts a new epoch.
+
+A single template version token works the same way for ScheduledItemTemplate
+and FoodFormula changes, which is what the daily template sync depends on.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+DATE_VERSION_PREFIX = 'diet_items:date_version:'
+TEMPLATE_VERSION_KEY = 'diet_items:template_version'
+VERSION_EPOCH_KEY = 'diet_items:version_epoch'
+
+
+def version_cache():
+    """The cache shared by all worker processes that holds the version tokens."""
+    return caches[getattr(settings, 'VERSION_CACHE_ALIAS', 'versions')]
+
+
+def _version_key(scheduled_date):
+    return f"{DATE_VERSION_PREFIX}{scheduled_date.isoformat()}"
+
+
+def get_date_versions(dates):
+    """Returns the current version token for each date (same order); unwritten dates get the epoch token."""
+    cache = version_cache()
+    keys = [_version_key(d) for d in dates]
+    found = cache.get_many([*keys, VERSION_EPOCH_KEY])
+    epoch = found.get(VERSION_EPOCH_KEY)
+    if epoch is None:
+        # add() so concurrent readers settle on whichever epoch was stored first
+        cache.add(VERSION_EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+        epoch = cache.get(VERSION_EPOCH_KEY)
+    return [found.get(key, epoch) for key in keys]
+
+
+def get_versions_digest(dates):
+    """Short digest of the version tokens of all dates, for keys covering a date range."""
+    return hashlib.sha1(''.join(get_date_versions(dates)).encode('ascii')).hexdigest()
+
+
+def _replace_date_versions(dates):
+    version_cache().set_many({_version_key(d): uuid.uuid4().hex for d in dates}, timeout=None)
+
+
+def bump_date_versions(dates):
+    """Invalidates everything cached for the given dates."""
+    dates = set(dates)
+    if dates:
+        _replace_date_versions(dates)
+        # Inside a transaction, a reader could cache the old (still committed) rows under the
+        # new token before this write commits, so replace the tokens once more on commit
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: _replace_date_versions(dates))
+
+
+def get_template_version():
+    """Token that changes whenever any ScheduledItemTemplate or FoodFormula changes."""
+    cache = version_cache()
+    token = cache.get(TEMPLATE_VERSION_KEY)
+    if token is None:
+        cache.add(TEMPLATE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        token = cache.get(TEMPLATE_VERSION_KEY)
+    return token
+
+
+def _replace_template_version():
+    version_cache().set(TEMPLATE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def bump_template_version():
+    _replace_template_version()
+    # Same commit-time replacement as bump_date_versions
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_replace_template_version)
+
+
+def get_or_build(key, build, timeout, lock_timeout=10, wait=5.0, poll_interval=0.05, cache=cache):
+    """
+    cache.get(key), or build() and cache it, with single flight: only the request holding
+    the `<key>:lock` entry (taken with an atomic cache.add) builds, concurrent misses poll
+    for its result. If the builder doesn't finish within `wait` seconds, the caller builds
+    its own copy uncached. The lock is per process with the default LocMemCache, global
+    when `cache` is shared (e.g. version_cache()).
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = build()
+            cache.set(key, value, timeout=timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            # The builder stores the value before releasing the lock, so check once more;
+            # still missing means it failed or its lock expired
+            value = cache.get(key)
+            if value is not None:
+                return value
+            break
+    return build()
@@ -0,0 +1,99 @@
+# diet_api/idempotency.py
+"""
+Idempotency-Key support for POST endpoints.
+
+Clients on flaky networks retry writes. When a request carries an
+``Idempotency-Key`` header, the first response is stored in the
+``idempotency`` cache (TTL + culling configured in settings.CACHES)
+and any retry with the same key is answered from that cache without
+running the view again. That cache must be shared by all worker
+processes (a DatabaseCache by default), since a retry can reach any of them.
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _get_cache():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'idempotency')]
+
+
+def _json_default(value):
+    # Uploaded files are represented by name/size; anything else (Decimal, dates) by str()
+    if hasattr(value, 'read'):
+        return [getattr(value, 'name', None), getattr(value, 'size', None)]
+    return str(value)
+
+
+def _request_fingerprint(request):
+    """Hashes the parsed request payload so a reused key with a different body can be rejected."""
+    data = request.data
+    if hasattr(data, 'lists'):  # QueryDict from form/multipart uploads
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=_json_default)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def idempotent(view_method):
+    """
+    Decorator for ViewSet handlers (create / @action methods).
+    Requests without the header are passed straight through.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'status': 'failed', 'message': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache = _get_cache()
+        # Scope the key to method + path so the same key on another endpoint can't collide
+        scope = hashlib.sha256(f"{request.method}:{request.path}:{key}".encode('utf-8')).hexdigest()
+        response_key = f"idempotency:response:{scope}"
+        lock_key = f"idempotency:lock:{scope}"
+        fingerprint = _request_fingerprint(request)
+
+        stored = cache.get(response_key)
+        if stored is not None:
+            if stored['fingerprint'] != fingerprint:
+                return Response(
+                    {'status': 'failed', 'message': 'Idempotency-Key was already used with a different request payload.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            print(f"Idempotency: replaying stored response for key {key!r}")
+            return Response(stored['data'], status=stored['status'], headers={REPLAYED_HEADER: 'true'})
+
+        # Only one request per key may run at a time; a concurrent retry gets a 409 and can try again
+        lock_timeout = getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 30)
+        if not cache.add(lock_key, fingerprint, timeout=lock_timeout):
+            return Response(
+                {'status': 'failed', 'message': 'A request with this Idempotency-Key is already in progress.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            # Server errors are not stored so the client can retry them
+            if response.status_code < 500:
+                cache.set(
+                    response_key,
+                    {'fingerprint': fingerprint, 'status': response.status_code, 'data': response.data},
+                    timeout=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60),
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
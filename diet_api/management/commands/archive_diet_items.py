@@ -0,0 +1,82 @@
+# diet_api/management/commands/archive_diet_items.py
+import datetime
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from diet_api.cache import bump_date_versions
+from diet_api.models import DietItem, DietDayArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves DietItems older than the retention horizon into DietDayArchive (one compressed row "
+        "per day with its nutrition aggregates). Safe to re-run; schedule it daily, e.g. as a cron "
+        "job running `python manage.py archive_diet_items`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.DIET_ARCHIVE_HORIZON_DAYS,
+            help='Archive days before today minus this many days (default: settings.DIET_ARCHIVE_HORIZON_DAYS)',
+        )
+        parser.add_argument('--batch-days', type=int, default=31, help='Days archived per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] < 1:
+            raise CommandError('--older-than-days must be at least 1; today and future days stay in the hot table.')
+        horizon = timezone.now().date() - datetime.timedelta(days=options['older_than_days'])
+        dates = list(
+            DietItem.objects.filter(scheduled_date__lt=horizon)
+            .order_by('scheduled_date').values_list('scheduled_date', flat=True).distinct()
+        )
+        if not dates:
+            self.stdout.write(f"Nothing to archive before {horizon}.")
+            return
+        if options['dry_run']:
+            count = DietItem.objects.filter(scheduled_date__lt=horizon).count()
+            self.stdout.write(f"Would archive {count} items across {len(dates)} days ({dates[0]} to {dates[-1]}).")
+            return
+
+        archived_items = 0
+        for offset in range(0, len(dates), options['batch_days']):
+            batch = dates[offset:offset + options['batch_days']]
+            archived_items += self._archive_dates(batch)
+            self.stdout.write(f"Archived {batch[0]} to {batch[-1]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived_items} items across {len(dates)} days older than {horizon}."
+        ))
+
+    # Primary keys per DELETE statement (keeps under SQLite's bound-parameter limit)
+    DELETE_BATCH_SIZE = 500
+
+    @transaction.atomic
+    def _archive_dates(self, dates):
+        # Lock the rows being archived so they can't be edited between the read and the delete
+        rows = list(
+            DietItem.objects.select_for_update().filter(scheduled_date__in=dates)
+            .order_by('scheduled_date', 'timing')
+            .values('scheduled_date', *DietDayArchive.PAYLOAD_FIELDS)
+        )
+        existing = DietDayArchive.objects.select_for_update().in_bulk(dates, field_name='scheduled_date')
+        for scheduled_date, day_rows in groupby(rows, key=lambda row: row['scheduled_date']):
+            day_rows = [{name: row[name] for name in DietDayArchive.PAYLOAD_FIELDS} for row in day_rows]
+            archive = existing.get(scheduled_date) or DietDayArchive(scheduled_date=scheduled_date)
+            if archive.pk:
+                # Items added to an already archived day later on are merged in (by id, newest copy wins)
+                merged = {row['id']: row for row in archive.get_rows()}
+                merged.update((row['id'], row) for row in day_rows)
+                day_rows = sorted(merged.values(), key=lambda row: str(row['timing']))
+            archive.set_rows(day_rows)
+            archive.save()
+        # Delete exactly the rows that were archived; anything inserted since stays for the next run
+        archived_ids = [row['id'] for row in rows]
+        for offset in range(0, len(archived_ids), self.DELETE_BATCH_SIZE):
+            DietItem.objects.filter(id__in=archived_ids[offset:offset + self.DELETE_BATCH_SIZE]).delete()
+        # Content is unchanged (only where it lives), but invalidate anyway so nothing stale is served
+        bump_date_versions(dates)
+        return len(rows)
@@ -0,0 +1,77 @@
+# diet_api/management/commands/bench_cold_start.py
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: boot the WSGI app, serve one GET, print status once the first body byte exists
+CHILD_CODE = """
+import io, sys
+from diet_tracker_project.wsgi import application
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'HTTP_ACCEPT': 'application/json', 'wsgi.url_scheme': 'http',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}
+status = []
+body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+first_chunk = next(iter(body), b'')
+print(status[0], len(first_chunk), flush=True)
+"""
+
+
+class Command(BaseCommand):
+    help = "Measures cold start to first byte: fresh interpreter -> WSGI app import -> first response byte."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/api/', help='Request path for the first request')
+        parser.add_argument('--api-only', action='store_true', help='Run workers with DJANGO_API_ONLY=True')
+        parser.add_argument('--output', help='Append the result as a JSON line to this file (e.g. bench_output.txt) to track it over time')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'diet_tracker_project.settings')}
+        env.setdefault('ALLOWED_HOSTS', 'localhost')
+        if options['api_only']:
+            env['DJANGO_API_ONLY'] = 'True'
+
+        timings = []
+        for _ in range(options['runs']):
+            began = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-c', CHILD_CODE, options['path']],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            elapsed = time.perf_counter() - began
+            if result.returncode != 0:
+                self.stderr.write(result.stderr[-2000:])
+                return
+            timings.append(elapsed)
+            response_status = result.stdout.strip()
+
+        summary = {
+            'benchmark': 'cold_start_ttfb',
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'path': options['path'],
+            'api_only': options['api_only'],
+            'runs': len(timings),
+            'min_ms': round(min(timings) * 1000, 1),
+            'median_ms': round(statistics.median(timings) * 1000, 1),
+            'max_ms': round(max(timings) * 1000, 1),
+        }
+        self.stdout.write(f"first response: {response_status}")
+        self.stdout.write(self.style.SUCCESS(
+            f"cold start to first byte ({'api-only' if options['api_only'] else 'full'}): "
+            f"min {summary['min_ms']} ms, median {summary['median_ms']} ms, max {summary['max_ms']} ms"
+        ))
+        if options['output']:
+            with open(options['output'], 'a') as fh:
+                fh.write(json.dumps(summary) + '\n')
@@ -0,0 +1,112 @@
+# diet_api/management/commands/bench_json.py
+import datetime
+import gzip
+import io
+import json
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework import parsers, renderers
+
+from diet_api import renderers as diet_renderers
+from diet_api.middleware import brotli
+from diet_api.models import DietItem
+from diet_api.serializers import DietItemSerializer
+from diet_api.sync import date_range
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks JSON rendering/parsing CPU time (DRF json vs orjson) and bytes on the wire "
+        "(raw/gzip/br) for a year-range DietItem list payload built from synthetic, unsaved items."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--items-per-day', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs (best is reported)')
+        parser.add_argument('--output', help='Append the result as a JSON line to this file to track it over time')
+
+    def build_items(self, days, per_day):
+        start = datetime.date(2025, 1, 1)
+        now = timezone.now()
+        items = []
+        for target_date in date_range(start, start + datetime.timedelta(days=days - 1)):
+            for slot in range(per_day):
+                items.append(DietItem(
+                    id=len(items) + 1, source_template_id=slot + 1, source_formula_id=slot % 12 + 1,
+                    scheduled_date=target_date, timing=datetime.time(slot * 24 // per_day, (slot * 37) % 60),
+                    food_name=f"Formula {slot % 12 + 1}", quantity_ml=100 + slot * 5, calories=150 + slot,
+                    protein_g=Decimal('6.25'), carbs_g=Decimal('20.10'), fat_g=Decimal('4.50'),
+                    description='Give slowly via PEG, flush with 30 ml water after.',
+                    is_administered=slot % 3 == 0, administered_at=now if slot % 3 == 0 else None,
+                    is_skipped=slot % 7 == 0, version=1, created_at=now, updated_at=now,
+                ))
+        return items
+
+    def best_cpu(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            began = time.process_time()
+            result = func()
+            timings.append(time.process_time() - began)
+        return min(timings), result
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        items = self.build_items(options['days'], options['items_per_day'])
+        serialize_s, data = self.best_cpu(lambda: DietItemSerializer(items, many=True).data, repeat)
+        self.stdout.write(f"{len(items)} items ({options['days']} days x {options['items_per_day']}/day)")
+        self.stdout.write(f"  DietItemSerializer.data: {serialize_s * 1000:.1f} ms CPU")
+
+        summary = {
+            'benchmark': 'json_payload',
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'items': len(items),
+            'serialize_ms': round(serialize_s * 1000, 1),
+        }
+        backends = [
+            ('drf', renderers.JSONRenderer(), parsers.JSONParser()),
+            ('orjson', diet_renderers.ORJSONRenderer(), diet_renderers.ORJSONParser()),
+        ]
+        if diet_renderers.orjson is None:
+            self.stdout.write(self.style.WARNING("  orjson is not installed; the orjson classes fall back to DRF's"))
+
+        payloads = {}
+        for name, renderer, parser in backends:
+            render_s, payloads[name] = self.best_cpu(lambda: renderer.render(data, 'application/json'), repeat)
+            parse_s, _ = self.best_cpu(lambda: parser.parse(io.BytesIO(payloads[name])), repeat)
+            summary[f'{name}_render_ms'] = round(render_s * 1000, 1)
+            summary[f'{name}_parse_ms'] = round(parse_s * 1000, 1)
+            self.stdout.write(f"  {name:>6}: render {render_s * 1000:.1f} ms, parse {parse_s * 1000:.1f} ms CPU")
+        if payloads['drf'] != payloads['orjson']:
+            self.stdout.write(self.style.WARNING("  rendered payloads differ between backends"))
+
+        content = payloads['orjson']
+        encoders = [('gzip', lambda: gzip.compress(content, compresslevel=6, mtime=0))]
+        if brotli is not None:
+            quality = settings.COMPRESSION_BROTLI_QUALITY
+            encoders.append(('br', lambda: brotli.compress(content, mode=brotli.MODE_TEXT, quality=quality)))
+        summary['raw_bytes'] = len(content)
+        self.stdout.write(f"  bytes raw: {len(content):,}")
+        for name, compress in encoders:
+            compress_s, compressed = self.best_cpu(compress, repeat)
+            summary[f'{name}_bytes'] = len(compressed)
+            summary[f'{name}_ms'] = round(compress_s * 1000, 1)
+            self.stdout.write(
+                f"  bytes {name}: {len(compressed):,} ({len(compressed) / len(content):.1%}), "
+                f"{compress_s * 1000:.1f} ms CPU"
+            )
+        if brotli is None:
+            self.stdout.write("  bytes br: skipped (brotli is not installed)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"render speedup {summary['drf_render_ms'] / max(summary['orjson_render_ms'], 0.1):.1f}x, "
+            f"parse speedup {summary['drf_parse_ms'] / max(summary['orjson_parse_ms'], 0.1):.1f}x"
+        ))
+        if options['output']:
+            with open(options['output'], 'a') as fh:
+                fh.write(json.dumps(summary) + '\n')
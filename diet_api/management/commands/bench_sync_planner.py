@@ -0,0 +1,73 @@
+# diet_api/management/commands/bench_sync_planner.py
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from diet_api import sync
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the pure template sync planner on synthetic templates x dates (no database access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', type=int, default=2000, help='Number of synthetic templates')
+        parser.add_argument('--days', type=int, default=365, help='Number of dates to plan')
+        parser.add_argument('--existing', type=float, default=0.8, help='Fraction of (date, template) slots that already have an item')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs (best is reported)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = datetime.date(2025, 1, 1)
+        dates = sync.date_range(start, start + datetime.timedelta(days=options['days'] - 1))
+
+        templates = [
+            sync.TemplateSnapshot(
+                id=template_id,
+                timing=datetime.time(template_id % 24, template_id % 60),
+                food_formula_id=template_id % 50 or None,
+                food_name=f"Formula {template_id}",
+                quantity_ml=100 + template_id % 200,
+                calories=200, protein_g=Decimal('10.0'), carbs_g=Decimal('20.0'), fat_g=Decimal('5.0'),
+                description='',
+            )
+            for template_id in range(1, options['templates'] + 1)
+        ]
+
+        # Existing items: mostly in sync, some drifted, some non-pending, some orphaned
+        items = []
+        item_id = 0
+        for target_date in dates:
+            for template in templates:
+                if rng.random() >= options['existing']:
+                    continue
+                item_id += 1
+                drifted = rng.random() < 0.05
+                items.append(sync.ItemSnapshot(
+                    id=item_id, scheduled_date=target_date,
+                    source_template_id=template.id if rng.random() > 0.01 else -template.id,
+                    timing=template.timing,
+                    food_name=template.food_name + (' (old)' if drifted else ''),
+                    quantity_ml=template.quantity_ml,
+                    source_formula_id=template.food_formula_id,
+                    is_pending=rng.random() > 0.3,
+                ))
+
+        self.stdout.write(f"{len(templates)} templates x {len(dates)} dates, {len(items)} existing items")
+        timings = []
+        for _ in range(options['repeat']):
+            began = time.perf_counter()
+            plan = sync.plan_sync(templates, items, dates)
+            timings.append(time.perf_counter() - began)
+
+        slots = len(templates) * len(dates)
+        best = min(timings)
+        self.stdout.write(
+            f"plan: create={len(plan.to_create)} update={len(plan.to_update)} delete={len(plan.to_delete)}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"best {best * 1000:.1f} ms over {options['repeat']} runs ({slots / best:,.0f} slots/s)"
+        ))
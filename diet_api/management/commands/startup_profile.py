@@ -0,0 +1,64 @@
+# diet_api/management/commands/startup_profile.py
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What a fresh process does before it can serve a request / run a command
+BOOT_CODE = {
+    'wsgi': (
+        "import diet_tracker_project.wsgi\n"
+        "from django.urls import resolve; resolve('/api/')\n"  # forces URLconf (views, serializers) import
+    ),
+    'manage': "import django; django.setup()\n",
+}
+# Modules we deliberately keep off the boot path
+# (django.contrib.admin itself is always imported: DRF's router pulls it in via admindocs)
+WATCHED_MODULES = ['PIL', 'numpy', 'dotenv', 'dj_database_url', 'diet_api.admin', 'django.contrib.sessions.middleware']
+
+
+class Command(BaseCommand):
+    help = "Reports which imports dominate startup, using `python -X importtime` in a fresh interpreter."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=list(BOOT_CODE), default='wsgi', help='Boot path to profile')
+        parser.add_argument('--top', type=int, default=25, help='Number of modules to list')
+        parser.add_argument('--api-only', action='store_true', help='Profile with DJANGO_API_ONLY=True')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'diet_tracker_project.settings')}
+        if options['api_only']:
+            env['DJANGO_API_ONLY'] = 'True'
+        code = BOOT_CODE[options['target']] + (
+            "import sys\n"
+            f"print(','.join(m for m in {WATCHED_MODULES!r} if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            self.stderr.write(result.stderr[-2000:])
+            return
+
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        rows = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+        total_us = sum(self_us for _, self_us, _ in rows)
+        self.stdout.write(f"{options['target']} boot: {len(rows)} modules imported, {total_us / 1000:.1f} ms total import time")
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[:options['top']]:
+            self.stdout.write(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+        loaded = [m for m in result.stdout.strip().split(',') if m]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f"Heavy/optional modules loaded at boot: {', '.join(loaded)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No watched heavy modules loaded at boot."))
@@ -0,0 +1,60 @@
+# diet_api/management/commands/sweep_media.py
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from diet_api.models import DietItem
+from diet_api.signals import delete_unreferenced_images
+from diet_api.storage import content_digest
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes uploaded images no DietItem or DietDayArchive references, including those the "
+        "on-delete cleanup kept because they were used within MEDIA_DELETE_GRACE_SECONDS, and "
+        "leftovers of interrupted uploads/deletes. Safe to re-run; schedule it daily, e.g. as a "
+        "cron job running `python manage.py sweep_media`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-seconds', type=int, default=settings.MEDIA_DELETE_GRACE_SECONDS,
+            help='Keep files stored or reused more recently than this (default: settings.MEDIA_DELETE_GRACE_SECONDS)',
+        )
+
+    def walk(self, directory):
+        try:
+            subdirs, files = default_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            yield f"{directory}/{name}"
+        for subdir in subdirs:
+            yield from self.walk(f"{directory}/{subdir}")
+
+    def handle(self, *args, **options):
+        grace = options['grace_seconds']
+        upload_to = DietItem._meta.get_field('image').upload_to.rstrip('/')
+        names, leftovers = [], 0
+        for name in self.walk(upload_to):
+            path = default_storage.path(name)
+            if '.deleting-' in name or '/.upload-' in name:
+                if time.time() - os.stat(path).st_mtime < grace:
+                    continue # Possibly still in progress
+                original = name.split('.deleting-')[0]
+                if '.deleting-' in name and not default_storage.exists(original):
+                    os.replace(path, default_storage.path(original)) # Interrupted delete: put it back for the checks below
+                    names.append(original)
+                else:
+                    os.remove(path)
+                leftovers += 1
+            elif content_digest(name):
+                names.append(name)
+
+        deleted = delete_unreferenced_images(names, grace=grace)
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(set(names))} images: deleted {len(deleted)} unreferenced, cleaned up {leftovers} leftovers."
+        ))
@@ -0,0 +1,79 @@
+# diet_api/middleware.py
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # Optional dependency: gzip only
+    brotli = None
+
+_CODING_RE = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header; missing q means 1."""
+    codings = {}
+    for part in header.lower().split(','):
+        match = _CODING_RE.match(part)
+        if match:
+            try:
+                codings[match.group(1)] = float(match.group(2)) if match.group(2) else 1.0
+            except ValueError:
+                continue
+    return codings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Negotiated brotli/gzip compression for responses of at least
+    COMPRESSION_MIN_SIZE bytes (replaces django's GZipMiddleware).
+
+    Prefers br when the client accepts it and the brotli package is installed.
+    Streaming responses (media files) and responses that already have a
+    Content-Encoding are left alone. Like GZipMiddleware, gzip output gets
+    random filename bytes as a BREACH mitigation and strong ETags are weakened.
+    """
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding == 'br':
+            compressed = brotli.compress(
+                response.content, mode=brotli.MODE_TEXT,
+                quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5),
+            )
+        elif encoding == 'gzip':
+            compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+        # Don't serve a "compressed" body that is bigger than the original
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def choose_encoding(accept_encoding):
+        codings = parse_accept_encoding(accept_encoding)
+        wildcard = codings.get('*', 0)
+        if brotli is not None and codings.get('br', wildcard) > 0:
+            return 'br'
+        if codings.get('gzip', wildcard) > 0:
+            return 'gzip'
+        return None
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-19 02:17
+
+from django.db import migrations, models
+
+
+# Admin search uses food_name__istartswith. A plain b-tree on food_name can't serve
+# a case-insensitive LIKE 'x%', so the index is created per database:
+#  - PostgreSQL: UPPER(food_name) with text_pattern_ops (matches Django's UPPER(...) LIKE UPPER(...))
+#  - SQLite: food_name COLLATE NOCASE (SQLite's LIKE is case-insensitive by default)
+def create_food_name_prefix_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS dietitem_food_name_prefix_idx '
+            'ON diet_api_dietitem (UPPER(food_name::text) text_pattern_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS dietitem_food_name_prefix_idx '
+            'ON diet_api_dietitem (food_name COLLATE NOCASE)'
+        )
+
+
+def drop_food_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute('DROP INDEX IF EXISTS dietitem_food_name_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diet_api', '0003_remove_dietitem_unique_daily_item_from_template_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dietitem',
+            index=models.Index(fields=['scheduled_date', 'timing'], name='dietitem_date_timing_idx'),
+        ),
+        migrations.RunPython(create_food_name_prefix_index, drop_food_name_prefix_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diet_api', '0004_dietitem_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DietDayArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_date', models.DateField(unique=True)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('administered_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('planned_quantity_ml', models.FloatField(default=0)),
+                ('planned_calories', models.FloatField(default=0)),
+                ('planned_protein_g', models.FloatField(default=0)),
+                ('planned_carbs_g', models.FloatField(default=0)),
+                ('planned_fat_g', models.FloatField(default=0)),
+                ('consumed_quantity_ml', models.FloatField(default=0)),
+                ('consumed_calories', models.FloatField(default=0)),
+                ('consumed_protein_g', models.FloatField(default=0)),
+                ('consumed_carbs_g', models.FloatField(default=0)),
+                ('consumed_fat_g', models.FloatField(default=0)),
+                ('payload', models.BinaryField(help_text="zlib-compressed JSON: {'fields': [...], 'rows': [[...], ...]}")),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['scheduled_date'],
+            },
+        ),
+    ]
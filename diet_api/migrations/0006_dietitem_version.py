@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diet_api', '0005_dietdayarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dietitem',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Incremented on every change; used for optimistic concurrency checks'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, transaction, OperationalError
+
+
+# Search index for /api/food-formulas/search/ (see diet_api/search.py), per database:
+#  - PostgreSQL: pg_trgm extension + GIN trigram index on name
+#  - SQLite: FTS5 table with the trigram tokenizer, backfilled here and kept
+#    in sync by signals. Skipped if this SQLite build lacks FTS5/trigram
+#    (needs 3.34+); search then falls back to plain lookups.
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS foodformula_name_trgm_idx '
+            'ON diet_api_foodformula USING gin (name gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                schema_editor.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS diet_api_foodformula_fts "
+                    "USING fts5(name, tokenize='trigram')"
+                )
+        except OperationalError:
+            return
+        schema_editor.execute(
+            'INSERT INTO diet_api_foodformula_fts (rowid, name) SELECT id, name FROM diet_api_foodformula'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS foodformula_name_trgm_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS diet_api_foodformula_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diet_api', '0006_dietitem_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 02:28
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def fill_archive_image_names(apps, schema_editor):
+    # Same as DietDayArchive.set_rows: the payload's distinct image names, one per line
+    DietDayArchive = apps.get_model('diet_api', 'DietDayArchive')
+    for archive in DietDayArchive.objects.all().iterator():
+        data = json.loads(zlib.decompress(bytes(archive.payload)))
+        image_index = data['fields'].index('image')
+        names = {row[image_index] for row in data['rows'] if row[image_index]}
+        if names:
+            archive.image_names = '\n'.join(sorted(names))
+            archive.save(update_fields=['image_names'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diet_api', '0007_foodformula_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dietdayarchive',
+            name='image_names',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='dietitem',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='diet_images/'),
+        ),
+        migrations.RunPython(fill_archive_image_names, migrations.RunPython.noop),
+    ]
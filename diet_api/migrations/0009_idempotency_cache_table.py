@@ -0,0 +1,20 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+# Creates the tables of the DatabaseCache aliases in settings.CACHES (the shared
+# idempotency and version caches), so a plain `migrate` on deploy is enough. createcachetable
+# skips tables that already exist; they are left in place on reverse.
+def create_cache_tables(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diet_api', '0008_media_references'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
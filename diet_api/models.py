@@ -1,4 +1,8 @@
 # diet_api/models.py
+import datetime
+import json
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError # Import for clean method
@@ -93,12 +97,34 @@ class DietItem(models.Model):
     carbs_g = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True)
     fat_g = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='diet_images/', null=True, blank=True)
+    # Stored content-addressed (diet_api/storage.py); indexed for the reference counts that clean up orphaned files
+    image = models.ImageField(upload_to='diet_images/', null=True, blank=True, db_index=True)
     is_administered = models.BooleanField(default=False, db_index=True)
     administered_at = models.DateTimeField(null=True, blank=True)
     is_skipped = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=1, help_text="Incremented on every change; used for optimistic concurrency checks")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Not a field: True on the read-only instances DietDayArchive.get_items() rebuilds, whose ids no longer exist
+    archived = False
+
+    def save(self, *args, **kwargs):
+        # Every saved change bumps the row version. Bulk writes (sync, admin actions)
+        # increment it themselves with F('version') + 1.
+        if not self._state.adding:
+            self.version = (self.version or 0) + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored date so caches for the old date are invalidated if it is moved
+        instance._loaded_scheduled_date = instance.__dict__.get('scheduled_date')
+        # ...and the stored image name, so a replaced image file can be cleaned up
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
 
     def __str__(self):
         status = "Administered" if self.is_administered else ("Skipped" if self.is_skipped else "Pending")
@@ -106,9 +132,89 @@ class DietItem(models.Model):
 
     class Meta:
         ordering = ['scheduled_date', 'timing']
+        indexes = [
+            # Day lists, date-range scans and the admin changelist all order by (date, time)
+            models.Index(fields=['scheduled_date', 'timing'], name='dietitem_date_timing_idx'),
+        ]
+        # The case-insensitive prefix index on food_name used by admin search is
+        # database-specific; created in migration 0004 and re-created after every
+        # migrate (signals.ensure_food_name_prefix_index) since SQLite table rebuilds drop it.
         # Removed the unique constraint based on source_template as CASCADE handles deletion.
         # If you need to prevent manual re-creation, add checks elsewhere.
         # constraints = [
         #     models.UniqueConstraint(fields=['scheduled_date', 'source_template'], name='unique_daily_item_from_template')
         # ]
 
+
+
+# Compact cold-storage copy of one past day's DietItems, written by `manage.py archive_diet_items`.
+# Keeps the per-day nutrition aggregates as columns (for analytics) and the items
+# themselves as a zlib-compressed, column-oriented JSON payload (for the daily list).
+class DietDayArchive(models.Model):
+    # Item fields kept in the payload, in row order
+    PAYLOAD_FIELDS = [
+        'id', 'source_template_id', 'source_formula_id', 'food_name', 'timing', 'quantity_ml',
+        'calories', 'protein_g', 'carbs_g', 'fat_g', 'description', 'image',
+        'is_administered', 'administered_at', 'is_skipped', 'created_at', 'updated_at',
+    ]
+    NUTRIENTS = ['quantity_ml', 'calories', 'protein_g', 'carbs_g', 'fat_g']
+
+    scheduled_date = models.DateField(unique=True)
+    item_count = models.PositiveIntegerField(default=0)
+    administered_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    planned_quantity_ml = models.FloatField(default=0)
+    planned_calories = models.FloatField(default=0)
+    planned_protein_g = models.FloatField(default=0)
+    planned_carbs_g = models.FloatField(default=0)
+    planned_fat_g = models.FloatField(default=0)
+    consumed_quantity_ml = models.FloatField(default=0)
+    consumed_calories = models.FloatField(default=0)
+    consumed_protein_g = models.FloatField(default=0)
+    consumed_carbs_g = models.FloatField(default=0)
+    consumed_fat_g = models.FloatField(default=0)
+    payload = models.BinaryField(help_text="zlib-compressed JSON: {'fields': [...], 'rows': [[...], ...]}")
+    # Image names referenced in the payload, one per line; counted as references by the media cleanup
+    image_names = models.TextField(blank=True, default='')
+    archived_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Archive of {self.scheduled_date} ({self.item_count} items)"
+
+    class Meta:
+        ordering = ['scheduled_date']
+
+    def get_rows(self):
+        """Payload rows as dicts of raw (JSON) values."""
+        data = json.loads(zlib.decompress(bytes(self.payload)))
+        return [dict(zip(data['fields'], row)) for row in data['rows']]
+
+    def set_rows(self, rows):
+        """Stores rows (dicts keyed by PAYLOAD_FIELDS) and recomputes the day's aggregates."""
+        def encode(value):
+            # Full isoformat (DjangoJSONEncoder would drop microseconds); Decimals are left to the encoder
+            return value.isoformat() if isinstance(value, (datetime.datetime, datetime.time)) else value
+
+        payload = {'fields': self.PAYLOAD_FIELDS, 'rows': [[encode(row[name]) for name in self.PAYLOAD_FIELDS] for row in rows]}
+        self.payload = zlib.compress(json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8'), 9)
+        self.image_names = '\n'.join(sorted({row['image'] for row in rows if row['image']}))
+        self.item_count = len(rows)
+        self.administered_count = sum(1 for row in rows if row['is_administered'])
+        self.skipped_count = sum(1 for row in rows if row['is_skipped'])
+        for name in self.NUTRIENTS:
+            setattr(self, f'planned_{name}', sum(float(row[name] or 0) for row in rows))
+            setattr(self, f'consumed_{name}', sum(float(row[name] or 0) for row in rows if row['is_administered']))
+
+    def get_items(self):
+        """Unsaved, read-only DietItem instances rebuilt from the payload."""
+        items = []
+        for row in self.get_rows():
+            values = {
+                name: DietItem._meta.get_field(name.removesuffix('_id')).to_python(value) if value is not None else None
+                for name, value in row.items()
+            }
+            values['image'] = values['image'] or ''
+            item = DietItem(scheduled_date=self.scheduled_date, **values)
+            item.archived = True
+            items.append(item)
+        return items
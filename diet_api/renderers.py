@@ -0,0 +1,57 @@
+# diet_api/renderers.py
+"""
+orjson-backed JSON renderer and parser for DRF, selected in settings.REST_FRAMEWORK.
+
+orjson serializes dicts/lists/str/int/float/date natively in C; anything it
+can't (Decimal, datetime/time, UUID, lazy strings...) goes through DRF's own
+JSONEncoder.default, so the output matches rest_framework.renderers.JSONRenderer
+byte for byte (compact form). If orjson isn't installed, or a caller asks for
+indented output (browsable API, ?indent), both classes fall back to DRF's
+json-module implementation.
+"""
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # Optional dependency: DRF's JSONRenderer/JSONParser behaviour is used instead
+    orjson = None
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _default(value):
+    return _drf_encoder.default(value)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # Pass datetime/time to DRF's encoder: it trims microseconds to milliseconds and writes UTC as 'Z'
+        content = orjson.dumps(
+            data, default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        # Same JavaScript-safety escaping of U+2028/U+2029 as DRF's renderer
+        if b'\xe2\x80' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class ORJSONParser(parsers.JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            # orjson rejects NaN/Infinity like DRF's strict parser does
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
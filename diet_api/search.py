@@ -0,0 +1,189 @@
+# diet_api/search.py
+"""
+Ranked search over FoodFormula names in three tiers: prefix matches, then
+substring matches, then typo-tolerant (trigram) matches. Each database uses its own index:
+
+- PostgreSQL: pg_trgm GIN index on name (migration 0007). It serves the ILIKE prefix and
+  substring tiers and the fuzzy operators: word similarity (<%, the query against
+  any part of the name) or whole-name similarity (%).
+- SQLite: an FTS5 table with the trigram tokenizer (diet_api_foodformula_fts,
+  rowid = formula id), created in migration 0007 and kept in sync by the
+  FoodFormula signals in signals.py. The index serves LIKE 'q%' / '%q%', and fuzzy
+  candidates are re-ranked in Python with the same scores pg_trgm uses.
+- Anything else (or SQLite without FTS5, or queries under 3 characters): ORM
+  istartswith then icontains, i.e. the first two tiers.
+
+Fuzzy matches rank by word similarity, then whole-name similarity, then name.
+"""
+import re
+
+from django.db import connections
+
+from .models import FoodFormula
+
+FTS_TABLE = 'diet_api_foodformula_fts'
+MAX_LIMIT = 50
+# FTS candidates fetched for fuzzy re-ranking on SQLite
+FUZZY_CANDIDATES = 100
+# pg_trgm's default thresholds for % (similarity) and <% (word_similarity)
+MIN_SIMILARITY = 0.3
+MIN_WORD_SIMILARITY = 0.6
+# pg_trgm splits words on anything that isn't a letter or digit
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def _ordered_trigrams(text):
+    """Trigrams in text order, as pg_trgm builds them: lowercase words padded with two spaces before, one after."""
+    grams = []
+    for word in WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _trigrams(text):
+    return set(_ordered_trigrams(text))
+
+
+def similarity(a, b):
+    a_grams, b_grams = _trigrams(a), _trigrams(b)
+    if not a_grams or not b_grams:
+        return 0.0
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+def word_similarity(query, text):
+    """
+    pg_trgm's word_similarity: the best similarity between the query's trigrams and any
+    continuous extent of the text's trigrams, so a query matching one word of a longer
+    name scores high ("cal" vs "Jevity 1.5 Cal" -> 1.0).
+    """
+    query_grams = _trigrams(query)
+    ordered = _ordered_trigrams(text)
+    best = 0.0
+    for start, first in enumerate(ordered):
+        # Extents that start or end on a trigram the query lacks only score lower
+        if first not in query_grams:
+            continue
+        extent, shared = set(), 0
+        for gram in ordered[start:]:
+            if gram not in extent:
+                extent.add(gram)
+                shared += gram in query_grams
+            if gram in query_grams:
+                best = max(best, shared / (len(query_grams) + len(extent) - shared))
+            # Even matching every remaining query trigram can't beat the best score any more
+            if len(query_grams) / max(len(extent), len(query_grams)) <= best:
+                break
+    return best
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def sqlite_fts_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def _search_postgresql(connection, query, limit):
+    prefix, substring = _escape_like(query) + '%', '%' + _escape_like(query) + '%'
+    with connection.cursor() as cursor:
+        # %% is a literal % (pg_trgm operators) in a parameterized query
+        cursor.execute(
+            f"""
+            SELECT id FROM {FoodFormula._meta.db_table}
+            WHERE name ILIKE %s OR %s <%% name OR name %% %s
+            ORDER BY (name ILIKE %s) DESC, (name ILIKE %s) DESC,
+                     word_similarity(%s, name) DESC, similarity(name, %s) DESC, name
+            LIMIT %s
+            """,
+            [substring, query, query, prefix, substring, query, query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_sqlite(connection, query, limit):
+    ids = []
+    with connection.cursor() as cursor:
+        # Prefix, then substring matches, both served by the trigram index; shorter names rank higher.
+        # FTS5 only uses the index for LIKE without an ESCAPE clause, so queries containing % or _
+        # never get here.
+        for pattern in (query + '%', '%' + query + '%'):
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE name LIKE %s ORDER BY length(name), name LIMIT %s",
+                [pattern, limit],
+            )
+            seen = set(ids)
+            ids += [row[0] for row in cursor.fetchall() if row[0] not in seen][:limit - len(ids)]
+            if len(ids) >= limit:
+                return ids
+
+        query_grams = {gram for gram in _trigrams(query) if ' ' not in gram}
+        if not query_grams:
+            return ids
+        # Fuzzy fill: any shared trigram makes a candidate (like pg_trgm's operators), best bm25 first,
+        # then re-ranked by word similarity and whole-name similarity
+        match = ' OR '.join('"{}"'.format(gram.replace('"', '""')) for gram in query_grams)
+        cursor.execute(
+            f"SELECT rowid, name FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [match, FUZZY_CANDIDATES],
+        )
+        candidates = cursor.fetchall()
+
+    seen = set(ids)
+    scored = []
+    for pk, name in candidates:
+        if pk in seen:
+            continue
+        word_score, score = word_similarity(query, name), similarity(query, name)
+        if word_score >= MIN_WORD_SIMILARITY or score >= MIN_SIMILARITY:
+            scored.append((-word_score, -score, name.lower(), pk))
+    return ids + [pk for *_, pk in sorted(scored)[:limit - len(ids)]]
+
+
+def search_formulas(query, limit=10):
+    """Returns up to `limit` FoodFormulas matching `query`, best first."""
+    query = query.strip()
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not query:
+        return []
+
+    connection = connections[FoodFormula.objects.db]
+    ids = None
+    if connection.vendor == 'postgresql':
+        ids = _search_postgresql(connection, query, limit)
+    elif (connection.vendor == 'sqlite' and len(query) >= 3 and not ('%' in query or '_' in query)
+          and sqlite_fts_available(connection)):
+        ids = _search_sqlite(connection, query, limit)
+
+    if ids is None:
+        # Short or wildcard-containing queries / no search index: prefix matches, then substring matches
+        prefix = list(FoodFormula.objects.filter(name__istartswith=query).order_by('name')[:limit])
+        seen = {formula.pk for formula in prefix}
+        rest = FoodFormula.objects.filter(name__icontains=query).exclude(pk__in=seen).order_by('name')
+        return prefix + list(rest[:limit - len(prefix)])
+
+    formulas = FoodFormula.objects.in_bulk(ids)
+    return [formulas[pk] for pk in ids if pk in formulas]
+
+
+# --- SQLite FTS maintenance (called from signals) ---
+
+def index_formula(formula):
+    connection = connections[FoodFormula.objects.db]
+    if connection.vendor != 'sqlite' or not sqlite_fts_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [formula.pk])
+        cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, name) VALUES (%s, %s)", [formula.pk, formula.name])
+
+
+def unindex_formula(formula_id):
+    connection = connections[FoodFormula.objects.db]
+    if connection.vendor != 'sqlite' or not sqlite_fts_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [formula_id])
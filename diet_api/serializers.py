@@ -2,6 +2,7 @@
 from rest_framework import serializers
 from .models import FoodFormula, ScheduledItemTemplate, DietItem
 from django.core.exceptions import ValidationError # Import ValidationError for model's clean method
+import datetime
 
 class FoodFormulaSerializer(serializers.ModelSerializer):
     class Meta:
@@ -48,6 +49,8 @@ class ScheduledItemTemplateSerializer(serializers.ModelSerializer):
 class DietItemSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(max_length=None, use_url=True, required=False, allow_null=True)
     timing_display = serializers.SerializerMethodField()
+    # Items served from DietDayArchive can't be changed: their ids no longer exist
+    archived = serializers.BooleanField(read_only=True)
     # Optionally include nested source details
     # source_template_details = ScheduledItemTemplateSerializer(source='source_template', read_only=True)
     # source_formula_details = FoodFormulaSerializer(source='source_formula', read_only=True)
@@ -72,6 +75,8 @@ class DietItemSerializer(serializers.ModelSerializer):
             'is_administered',
             'administered_at',
             'is_skipped',
+            'version',
+            'archived',
             'created_at',
             'updated_at',
             # Optional nested details:
@@ -80,6 +85,7 @@ class DietItemSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             'administered_at',
+            'version',
             'created_at',
             'updated_at',
             'timing_display',
@@ -95,4 +101,65 @@ class DietItemSerializer(serializers.ModelSerializer):
         if data.get('is_administered', False) and data.get('is_skipped', False):
             raise serializers.ValidationError("An item cannot be both administered and skipped.")
         # Add any new validation if needed
-        return data
\ No newline at end of file
+        return data
+
+class DietItemCopySerializer(serializers.Serializer):
+    """Input for POST /diet-items/copy/: clone a source day or week onto target start dates."""
+    SPAN_DAYS = {'day': 1, 'week': 7}
+
+    source_date = serializers.DateField(help_text="First day of the source range")
+    span = serializers.ChoiceField(choices=list(SPAN_DAYS), default='day')
+    target_dates = serializers.ListField(
+        child=serializers.DateField(), min_length=1, max_length=60,
+        help_text="Start date of each copy (one day or week per entry)"
+    )
+    skip_existing = serializers.BooleanField(
+        default=True,
+        help_text="Skip items whose (timing, food name) slot, or template, already exists on the target date"
+    )
+
+    def validate(self, data):
+        days = self.SPAN_DAYS[data['span']]
+        source_start = data['source_date']
+        source_end = source_start + datetime.timedelta(days=days - 1)
+        targets = sorted(set(data['target_dates']))
+        for target in targets:
+            # Overlapping copies would read and write the same dates
+            if abs((target - source_start).days) < days:
+                raise serializers.ValidationError(f"Target {target} overlaps the source range {source_start} to {source_end}.")
+        for earlier, later in zip(targets, targets[1:]):
+            if (later - earlier).days < days:
+                raise serializers.ValidationError(f"Targets {earlier} and {later} overlap.")
+        data['source_end'] = source_end
+        data['target_dates'] = targets
+        return data
+
+
+class DietItemMutationSerializer(serializers.Serializer):
+    """One queued offline edit in a POST /diet-items/batch/ request."""
+    OPS = ['create', 'patch', 'delete', 'status']
+    STATUSES = ['administered', 'skipped', 'pending']
+
+    op = serializers.ChoiceField(choices=OPS)
+    id = serializers.IntegerField(required=False, help_text="Target item (patch/delete/status)")
+    ref = serializers.CharField(
+        required=False, max_length=100,
+        help_text="Client reference: names the item on create, or targets an item created earlier in the batch"
+    )
+    version = serializers.IntegerField(
+        required=False, min_value=1,
+        help_text="Version the client last saw; a mismatch is reported as a conflict instead of overwriting"
+    )
+    data = serializers.DictField(required=False, default=dict, help_text="Item fields for create/patch")
+    status = serializers.ChoiceField(choices=STATUSES, required=False)
+
+    def validate(self, data):
+        if data['op'] != 'create' and 'id' not in data and 'ref' not in data:
+            raise serializers.ValidationError(f"'{data['op']}' needs an id or a ref.")
+        if data['op'] == 'status' and 'status' not in data:
+            raise serializers.ValidationError("'status' mutations need a status.")
+        return data
+
+
+class DietItemBatchSerializer(serializers.Serializer):
+    mutations = DietItemMutationSerializer(many=True, allow_empty=False, max_length=500)
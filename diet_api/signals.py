@@ -0,0 +1,129 @@
+# diet_api/signals.py
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from .cache import bump_date_versions, bump_template_version
+from .models import DietItem, DietDayArchive, FoodFormula, ScheduledItemTemplate
+from .search import index_formula, unindex_formula
+
+
+def _item_dates(instance):
+    # scheduled_date may still be a datetime (model default) or string before a refresh
+    to_date = DietItem._meta.get_field('scheduled_date').to_python
+    dates = {to_date(instance.scheduled_date)}
+    loaded = getattr(instance, '_loaded_scheduled_date', None)
+    if loaded is not None:
+        dates.add(to_date(loaded))
+    return dates
+
+
+def image_is_referenced(name):
+    return (
+        DietItem.objects.filter(image=name).exists()
+        or DietDayArchive.objects.filter(image_names__contains=name).exists()
+    )
+
+
+def delete_unreferenced_images(names, grace=None):
+    """
+    Deletes stored image files that no DietItem or DietDayArchive refers to any more.
+    Files are content-addressed and shared (copies, duplicate uploads), so they are
+    reference-counted by querying rather than deleted with a single row. Files stored or
+    reused within the grace period are kept, since a concurrent upload may be about to
+    reference them; `manage.py sweep_media` deletes them once they are older.
+    """
+    if grace is None:
+        grace = getattr(settings, 'MEDIA_DELETE_GRACE_SECONDS', 10 * 60)
+    deleted = []
+    for name in set(filter(None, names)):
+        if image_is_referenced(name):
+            continue
+        if hasattr(default_storage, 'delete_if_unused'):
+            if not default_storage.delete_if_unused(name, lambda: image_is_referenced(name), grace):
+                continue
+        else:
+            default_storage.delete(name)
+        print(f"Deleted orphaned image {name}")
+        deleted.append(name)
+    return deleted
+
+
+def _delete_unreferenced_images_on_commit(names):
+    # After commit, so a rolled-back delete can't lose the file and the counts see committed rows
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: delete_unreferenced_images(names))
+
+
+@receiver(post_save, sender=DietItem)
+def invalidate_saved_diet_item(sender, instance, **kwargs):
+    # Bulk operations (bulk_create/bulk_update/update) skip signals and bump versions themselves
+    bump_date_versions(_item_dates(instance))
+    instance._loaded_scheduled_date = instance.scheduled_date
+    # Replaced or cleared image: the old file may now be unused
+    loaded_image = getattr(instance, '_loaded_image', None)
+    if loaded_image and loaded_image != instance.image.name:
+        _delete_unreferenced_images_on_commit([loaded_image])
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=DietItem)
+def invalidate_deleted_diet_item(sender, instance, **kwargs):
+    bump_date_versions(_item_dates(instance))
+    _delete_unreferenced_images_on_commit([instance.image.name])
+
+
+@receiver(post_delete, sender=DietDayArchive)
+def release_archived_images(sender, instance, **kwargs):
+    _delete_unreferenced_images_on_commit(instance.image_names.splitlines())
+
+
+# Keep the SQLite FTS search table in step with FoodFormula (no-op on other databases)
+@receiver(post_save, sender=FoodFormula)
+def index_saved_formula(sender, instance, **kwargs):
+    index_formula(instance)
+
+
+@receiver(post_delete, sender=FoodFormula)
+def unindex_deleted_formula(sender, instance, **kwargs):
+    unindex_formula(instance.pk)
+
+
+# Any template or formula change (formula names feed item names) means dates need re-syncing
+@receiver(post_save, sender=ScheduledItemTemplate)
+@receiver(post_delete, sender=ScheduledItemTemplate)
+@receiver(post_save, sender=FoodFormula)
+@receiver(post_delete, sender=FoodFormula)
+def invalidate_template_version(sender, instance, **kwargs):
+    bump_template_version()
+
+
+# The case-insensitive prefix index behind the admin's food_name search (migration 0004) is
+# vendor-specific raw SQL, so it isn't part of the model state. SQLite rebuilds the table for
+# many schema changes (e.g. 0006, 0008) and drops such indexes; re-create it after every migrate.
+@receiver(post_migrate)
+def ensure_food_name_prefix_index(sender, using='default', apps=None, **kwargs):
+    if sender.name != 'diet_api' or apps is None:
+        return
+    try:
+        model = apps.get_model('diet_api', 'DietItem')
+    except LookupError:
+        return
+    # Only once 0004 is applied; it adds dietitem_date_timing_idx to the model state alongside
+    if not any(index.name == 'dietitem_date_timing_idx' for index in model._meta.indexes):
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS dietitem_food_name_prefix_idx '
+                'ON diet_api_dietitem (UPPER(food_name::text) text_pattern_ops)'
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS dietitem_food_name_prefix_idx '
+                'ON diet_api_dietitem (food_name COLLATE NOCASE)'
+            )
@@ -0,0 +1,78 @@
+# diet_api/storage.py
+"""
+Content-addressed media storage (settings.STORAGES['default']).
+
+Uploads are stored as <upload_to>/<sha[:2]>/<sha256><ext>, so identical
+uploads share one file and a stored name never changes content. That is
+what makes the media view's `Cache-Control: immutable` safe. Files are
+deleted once no DietItem or DietDayArchive references them (see signals.py).
+
+Because a new upload can reuse an existing file before its row is committed,
+deletion never races it: reuse refreshes the file's mtime, and delete_if_unused
+moves the file aside, re-checks, and keeps anything referenced or used within
+the grace period (`manage.py sweep_media` collects those later).
+"""
+import hashlib
+import os
+import re
+import time
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?:\.[A-Za-z0-9]+)?$')
+
+
+def content_digest(name):
+    """The sha256 a content-addressed name was derived from, or None for other (legacy) names."""
+    match = HASHED_NAME_RE.search(name)
+    return match.group('digest') if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        sha = hashlib.sha256()
+        for chunk in content.chunks():
+            sha.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        content.seek(0)
+        digest = sha.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension).replace('\\', '/')
+
+    def get_available_name(self, name, max_length=None):
+        # Same name means same bytes, so an existing file is reused rather than renamed
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        try:
+            # Reuse the stored file; the fresh mtime tells a concurrent delete_if_unused to keep it
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass # New content, or the file is being deleted right now: store it (again)
+        # Write under a unique temporary name and move into place atomically, so a crashed
+        # or concurrent upload never leaves a partial file under the hash name
+        temp_name = super()._save(f"{os.path.dirname(name)}/.upload-{uuid.uuid4().hex}", content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+    def delete_if_unused(self, name, is_referenced, grace):
+        """
+        Deletes `name` unless is_referenced() or the file was stored or reused less than
+        `grace` seconds ago. The file is first moved aside, so an upload reusing it from
+        here on stores a new copy, and an upload that reused it earlier shows up in the
+        re-check or the mtime. Returns True if the file was deleted.
+        """
+        path = self.path(name)
+        aside = f"{path}.deleting-{uuid.uuid4().hex}"
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            return False
+        if is_referenced() or time.time() - os.stat(aside).st_mtime < grace:
+            os.replace(aside, path) # Same name, same bytes, even if an upload stored it again meanwhile
+            return False
+        os.remove(aside)
+        return True
@@ -0,0 +1,240 @@
+# diet_api/sync.py
+"""
+Template -> DietItem synchronization, split into three steps:
+
+1. snapshot: read templates and template-derived items into plain tuples
+2. plan:     pure, set-based comparison producing create/update/delete sets
+3. apply:    bulk DB writes for a plan
+
+The planner never touches the database, so the same code answers
+"what would change" previews and performs the live sync.
+
+Rules (unchanged from the original per-date sync):
+- Only PENDING items (not administered, not skipped) are modified or deleted.
+- A template with a non-pending item on a date is left alone for that date.
+- Only the core fields (timing, food_name, quantity_ml, source_formula) are
+  updated, so manual edits to nutrients/description/image survive.
+- Manually added items (no source_template) are never touched.
+"""
+import datetime
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+from django.db.models import F
+
+from .models import ScheduledItemTemplate, DietItem
+from .cache import bump_date_versions
+
+# Fields the sync keeps in step with the template on pending items
+SYNC_UPDATE_FIELDS = ['timing', 'food_name', 'quantity_ml', 'source_formula']
+
+TemplateSnapshot = namedtuple('TemplateSnapshot', [
+    'id', 'timing', 'food_formula_id', 'food_name', 'quantity_ml',
+    'calories', 'protein_g', 'carbs_g', 'fat_g', 'description',
+])
+
+ItemSnapshot = namedtuple('ItemSnapshot', [
+    'id', 'scheduled_date', 'source_template_id', 'timing', 'food_name',
+    'quantity_ml', 'source_formula_id', 'is_pending',
+])
+
+
+@dataclass
+class SyncPlan:
+    # (scheduled_date, TemplateSnapshot) pairs for items that should be created
+    to_create: list = field(default_factory=list)
+    # (ItemSnapshot, TemplateSnapshot, {field: (old, new)}) for pending items whose core fields drifted
+    to_update: list = field(default_factory=list)
+    # ItemSnapshots of pending items whose template no longer exists
+    to_delete: list = field(default_factory=list)
+
+    def is_empty(self):
+        return not (self.to_create or self.to_update or self.to_delete)
+
+
+def date_range(start, end):
+    """Inclusive list of dates from start to end."""
+    return [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+# --- Snapshots ---
+
+def template_snapshot(template):
+    """Resolves a (possibly unsaved) template into the values a daily item gets from it."""
+    formula = template.food_formula
+
+    def resolve(value, formula_attr):
+        # Template value wins; fall back to the formula default only if the template field is null
+        if value is not None:
+            return value
+        return getattr(formula, formula_attr) if formula else None
+
+    return TemplateSnapshot(
+        id=template.id,
+        timing=template.timing,
+        food_formula_id=template.food_formula_id,
+        food_name=template.get_display_name(),
+        quantity_ml=template.quantity_ml,
+        calories=resolve(template.calories, 'default_calories'),
+        protein_g=resolve(template.protein_g, 'default_protein_g'),
+        carbs_g=resolve(template.carbs_g, 'default_carbs_g'),
+        fat_g=resolve(template.fat_g, 'default_fat_g'),
+        # Template description takes priority if present
+        description=template.description if template.description else (formula.default_description if formula else ''),
+    )
+
+
+def snapshot_templates():
+    return [template_snapshot(t) for t in ScheduledItemTemplate.objects.select_related('food_formula')]
+
+
+def snapshot_items(dates):
+    """Template-derived DietItems on the given dates, as ItemSnapshots."""
+    if not dates:
+        return []
+    rows = DietItem.objects.filter(
+        scheduled_date__gte=min(dates),
+        scheduled_date__lte=max(dates),
+        source_template__isnull=False,
+    ).order_by('scheduled_date', 'timing').values_list(
+        'id', 'scheduled_date', 'source_template_id', 'timing', 'food_name',
+        'quantity_ml', 'source_formula_id', 'is_administered', 'is_skipped',
+    )
+    return [
+        ItemSnapshot(*row[:7], is_pending=not (row[7] or row[8]))
+        for row in rows
+    ]
+
+
+# --- Planning (pure) ---
+
+def plan_sync(templates, items, dates):
+    """
+    Computes the SyncPlan that brings `items` in line with `templates` on `dates`.
+    `templates` and `items` are TemplateSnapshot / ItemSnapshot sequences.
+    """
+    templates_by_id = {t.id: t for t in templates}
+    template_ids = set(templates_by_id)
+
+    pending_by_date = {}
+    non_pending_by_date = {}
+    for item in items:
+        if item.is_pending:
+            # Later items win, matching the original dict-based sync
+            pending_by_date.setdefault(item.scheduled_date, {})[item.source_template_id] = item
+        else:
+            non_pending_by_date.setdefault(item.scheduled_date, set()).add(item.source_template_id)
+
+    plan = SyncPlan()
+    for target_date in dates:
+        pending = pending_by_date.get(target_date, {})
+        non_pending = non_pending_by_date.get(target_date, set())
+        pending_ids = pending.keys()
+
+        for template_id in sorted(template_ids - non_pending - pending_ids, key=lambda i: templates_by_id[i].timing):
+            plan.to_create.append((target_date, templates_by_id[template_id]))
+
+        for template_id in (template_ids & pending_ids) - non_pending:
+            item = pending[template_id]
+            template = templates_by_id[template_id]
+            changes = {
+                name: (old, new)
+                for name, old, new in (
+                    ('timing', item.timing, template.timing),
+                    ('food_name', item.food_name, template.food_name),
+                    ('quantity_ml', item.quantity_ml, template.quantity_ml),
+                    ('source_formula', item.source_formula_id, template.food_formula_id),
+                )
+                if old != new
+            }
+            if changes:
+                plan.to_update.append((item, template, changes))
+
+        for template_id in pending_ids - template_ids:
+            plan.to_delete.append(pending[template_id])
+
+    return plan
+
+
+# --- Applying ---
+
+def apply_plan(plan):
+    """Writes a SyncPlan with bulk operations. Call inside a transaction."""
+    if plan.to_delete:
+        deleted_count, _ = DietItem.objects.filter(id__in=[item.id for item in plan.to_delete]).delete()
+        print(f"Sync deleted {deleted_count} orphaned pending items.")
+    if plan.to_create:
+        created_items = DietItem.objects.bulk_create([
+            DietItem(
+                source_template_id=template.id, source_formula_id=template.food_formula_id,
+                scheduled_date=target_date, timing=template.timing,
+                food_name=template.food_name, quantity_ml=template.quantity_ml, calories=template.calories,
+                protein_g=template.protein_g, carbs_g=template.carbs_g, fat_g=template.fat_g,
+                description=template.description,
+                is_administered=False, is_skipped=False
+            )
+            for target_date, template in plan.to_create
+        ], ignore_conflicts=True)
+        print(f"Sync created {len(created_items)} new items from template.")
+    if plan.to_update:
+        updated_count = DietItem.objects.bulk_update([
+            DietItem(
+                id=item.id, timing=template.timing, food_name=template.food_name,
+                quantity_ml=template.quantity_ml, source_formula_id=template.food_formula_id,
+                version=F('version') + 1,
+            )
+            for item, template, _changes in plan.to_update
+        ], SYNC_UPDATE_FIELDS + ['version'])
+        print(f"Sync updated {updated_count} pending items from template.")
+    # Bulk writes don't send model signals, so invalidate cached data for the touched dates here
+    bump_date_versions(
+        [target_date for target_date, _template in plan.to_create]
+        + [item.scheduled_date for item, _template, _changes in plan.to_update]
+    )
+
+
+def synchronize_dates(dates):
+    """Live sync: snapshot, plan and apply for the given dates. Returns the applied plan."""
+    plan = plan_sync(snapshot_templates(), snapshot_items(dates), dates)
+    apply_plan(plan)
+    return plan
+
+
+def describe_plan(plan):
+    """JSON-friendly view of a plan, used by the sync preview endpoint."""
+    return {
+        'summary': {
+            'create': len(plan.to_create),
+            'update': len(plan.to_update),
+            'delete': len(plan.to_delete),
+        },
+        'create': [
+            {
+                'scheduled_date': target_date,
+                'source_template': template.id,
+                'timing': template.timing,
+                'food_name': template.food_name,
+                'quantity_ml': template.quantity_ml,
+            }
+            for target_date, template in plan.to_create
+        ],
+        'update': [
+            {
+                'id': item.id,
+                'scheduled_date': item.scheduled_date,
+                'source_template': item.source_template_id,
+                'changes': {name: {'from': old, 'to': new} for name, (old, new) in changes.items()},
+            }
+            for item, _template, changes in plan.to_update
+        ],
+        'delete': [
+            {
+                'id': item.id,
+                'scheduled_date': item.scheduled_date,
+                'source_template': item.source_template_id,
+                'timing': item.timing,
+                'food_name': item.food_name,
+            }
+            for item in plan.to_delete
+        ],
+    }
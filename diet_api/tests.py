@@ -1,3 +1,835 @@
-from django.test import TestCase
+import datetime
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import middleware, renderers, search, sync, views
+from .cache import DATE_VERSION_PREFIX, bump_template_version, get_date_versions
+from .middleware import CompressionMiddleware
+from .models import DietItem, DietDayArchive, FoodFormula, ScheduledItemTemplate
+from .serializers import DietItemSerializer
+from .views import DietItemViewSet
+
+
+def item_payload(**overrides):
+    payload = {
+        'food_name': 'Test feed',
+        'timing': '08:00',
+        'quantity_ml': 200,
+        'scheduled_date': '2031-01-01',
+    }
+    payload.update(overrides)
+    return payload
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_retry_with_same_key_replays_without_creating_again(self):
+        first = self.client.post('/api/diet-items/', item_payload(), format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        retry = self.client.post('/api/diet-items/', item_payload(), format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(DietItem.objects.count(), 1)
+
+    def test_same_key_with_different_payload_is_rejected(self):
+        self.client.post('/api/diet-items/', item_payload(), format='json', HTTP_IDEMPOTENCY_KEY='retry-2')
+        response = self.client.post(
+            '/api/diet-items/', item_payload(quantity_ml=50), format='json', HTTP_IDEMPOTENCY_KEY='retry-2',
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(DietItem.objects.count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.client.post('/api/diet-items/', item_payload(), format='json')
+        self.client.post('/api/diet-items/', item_payload(), format='json')
+
+        self.assertEqual(DietItem.objects.count(), 2)
+
+
+def template_snap(template_id, **overrides):
+    values = dict(
+        id=template_id, timing=datetime.time(8, template_id), food_formula_id=None,
+        food_name=f'Feed {template_id}', quantity_ml=200, calories=300,
+        protein_g=None, carbs_g=None, fat_g=None, description='',
+    )
+    values.update(overrides)
+    return sync.TemplateSnapshot(**values)
+
+
+def item_snap(item_id, template, scheduled_date, is_pending=True, **overrides):
+    values = dict(
+        id=item_id, scheduled_date=scheduled_date, source_template_id=template.id,
+        timing=template.timing, food_name=template.food_name, quantity_ml=template.quantity_ml,
+        source_formula_id=template.food_formula_id, is_pending=is_pending,
+    )
+    values.update(overrides)
+    return sync.ItemSnapshot(**values)
+
+
+class SyncPlannerTests(SimpleTestCase):
+    day = datetime.date(2031, 1, 1)
+
+    def test_creates_items_for_missing_templates(self):
+        first, second = template_snap(1), template_snap(2)
+        plan = sync.plan_sync([first, second], [item_snap(10, first, self.day)], [self.day])
+
+        self.assertEqual(plan.to_create, [(self.day, second)])
+        self.assertEqual(plan.to_update, [])
+        self.assertEqual(plan.to_delete, [])
+
+    def test_non_pending_items_are_left_alone(self):
+        template = template_snap(1)
+        administered = item_snap(10, template, self.day, is_pending=False, food_name='Old name', quantity_ml=50)
+        plan = sync.plan_sync([template], [administered], [self.day])
+
+        # Not updated to the template, and no second item is created next to it
+        self.assertTrue(plan.is_empty())
+
+    def test_only_pending_orphans_are_deleted(self):
+        removed = template_snap(2)
+        pending_orphan = item_snap(10, removed, self.day)
+        done_orphan = item_snap(11, removed, self.day + datetime.timedelta(days=1), is_pending=False)
+        plan = sync.plan_sync([], [pending_orphan, done_orphan], [self.day, self.day + datetime.timedelta(days=1)])
+
+        self.assertEqual(plan.to_delete, [pending_orphan])
+        self.assertEqual(plan.to_create, [])
+
+    def test_updates_report_only_drifted_core_fields(self):
+        template = template_snap(1, food_name='New name', quantity_ml=250)
+        item = item_snap(10, template, self.day, food_name='Old name')
+        plan = sync.plan_sync([template], [item], [self.day])
+
+        self.assertEqual(plan.to_update, [(item, template, {'food_name': ('Old name', 'New name')})])
+
+    def test_items_in_sync_produce_an_empty_plan(self):
+        template = template_snap(1)
+        plan = sync.plan_sync([template], [item_snap(10, template, self.day)], [self.day])
+
+        self.assertTrue(plan.is_empty())
+
+
+class TemplateSyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.day = timezone.now().date() + datetime.timedelta(days=10)
+        self.next_day = self.day + datetime.timedelta(days=1)
+        self.kept = ScheduledItemTemplate.objects.create(timing=datetime.time(8, 0), custom_food_name='Kept', quantity_ml=200)
+        self.edited = ScheduledItemTemplate.objects.create(timing=datetime.time(12, 0), custom_food_name='Edited', quantity_ml=200)
+        self.added = ScheduledItemTemplate.objects.create(timing=datetime.time(18, 0), custom_food_name='Added', quantity_ml=100)
+        DietItem.objects.create(
+            source_template=self.kept, scheduled_date=self.day, timing=self.kept.timing, food_name='Kept', quantity_ml=200,
+        )
+        # Pending item whose template changed since, with manual nutrient/description edits
+        self.edited_item = DietItem.objects.create(
+            source_template=self.edited, scheduled_date=self.day, timing=self.edited.timing,
+            food_name='Before edit', quantity_ml=200, calories=999, description='Manual note',
+        )
+        # Administered item that no longer matches its template: must not be touched or duplicated
+        self.done_item = DietItem.objects.create(
+            source_template=self.added, scheduled_date=self.next_day, timing=self.added.timing,
+            food_name='Given earlier', quantity_ml=10, is_administered=True,
+        )
+
+    def preview(self, method='get', template=None, data=None):
+        path = f'/api/schedule-templates/{template.pk}/sync-preview/' if template else '/api/schedule-templates/sync-preview/'
+        query = f'?start={self.day.isoformat()}&end={self.next_day.isoformat()}'
+        response = getattr(self.client, method)(path + query, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def live_sync(self):
+        with transaction.atomic():
+            return sync.describe_plan(sync.synchronize_dates([self.day, self.next_day]))
+
+    def assertSamePlan(self, preview, live):
+        self.assertEqual(preview['summary'], live['summary'])
+        self.assertEqual(
+            sorted((c['source_template'], c['scheduled_date']) for c in preview['create']),
+            sorted((c['source_template'], c['scheduled_date']) for c in live['create']),
+        )
+        self.assertEqual(
+            [(u['id'], u['changes']) for u in preview['update']],
+            [(u['id'], u['changes']) for u in live['update']],
+        )
+        self.assertEqual([d['id'] for d in preview['delete']], [d['id'] for d in live['delete']])
+
+    def test_preview_matches_live_sync(self):
+        preview = self.preview()
+        self.assertSamePlan(preview, self.live_sync())
+        self.assertEqual(preview['summary'], {'create': 3, 'update': 1, 'delete': 0})
+        # Once applied, there is nothing left to do
+        self.assertEqual(self.preview()['summary'], {'create': 0, 'update': 0, 'delete': 0})
+
+    def test_edit_preview_matches_live_sync_after_the_edit(self):
+        self.live_sync()
+        change = {'timing': '08:30', 'custom_food_name': 'Kept', 'quantity_ml': 250}
+        preview = self.preview('post', self.kept, change)
+
+        self.client.put(f'/api/schedule-templates/{self.kept.pk}/', change, format='json')
+        self.assertSamePlan(preview, self.live_sync())
+        self.assertEqual(preview['summary'], {'create': 0, 'update': 2, 'delete': 0})
+
+    def test_live_sync_updates_core_fields_only_and_keeps_non_pending_items(self):
+        self.live_sync()
+
+        self.edited_item.refresh_from_db()
+        self.assertEqual(self.edited_item.food_name, 'Edited')
+        self.assertEqual(self.edited_item.calories, 999)
+        self.assertEqual(self.edited_item.description, 'Manual note')
+
+        self.done_item.refresh_from_db()
+        self.assertEqual(self.done_item.food_name, 'Given earlier')
+        self.assertEqual(DietItem.objects.filter(scheduled_date=self.next_day, source_template=self.added).count(), 1)
+
+
+class AdminSearchIndexTests(TestCase):
+    def test_food_name_prefix_search_uses_index_after_all_migrations(self):
+        # The test database is built by running every migration, including the SQLite table rebuilds
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('The prefix index is only created on SQLite and PostgreSQL')
+        plan = DietItem.objects.filter(food_name__istartswith='pep').values_list('id', flat=True).explain()
+        self.assertIn('dietitem_food_name_prefix_idx', plan)
+
+
+
+class FormulaSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['Jevity 1.5 Cal', 'Calogen', 'Nepro HP Vanilla', 'Peptamen 1.5', 'Osmolite']:
+            FoodFormula.objects.create(name=name)
+
+    def search(self, q):
+        response = APIClient().get('/api/food-formulas/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [formula['name'] for formula in response.json()]
+
+    def test_word_similarity_matches_pg_trgm(self):
+        # Example from the pg_trgm documentation
+        self.assertAlmostEqual(search.word_similarity('word', 'two words'), 0.8)
+        self.assertEqual(search.word_similarity('cal', 'Jevity 1.5 Cal'), 1.0)
+
+    def test_finds_words_inside_longer_names(self):
+        self.assertEqual(self.search('Cal'), ['Calogen', 'Jevity 1.5 Cal'])
+        self.assertEqual(self.search('1.5'), ['Peptamen 1.5', 'Jevity 1.5 Cal'])
+        self.assertEqual(self.search('HP'), ['Nepro HP Vanilla'])
+
+    def test_typo_still_matches(self):
+        self.assertEqual(self.search('vanila'), ['Nepro HP Vanilla'])
+        self.assertEqual(self.search('osmolyte'), ['Osmolite'])
+        self.assertEqual(self.search('xyzzy'), [])
+
+
+
+class CopyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.source = datetime.date(2031, 1, 6)  # Monday
+        self.template = ScheduledItemTemplate.objects.create(timing=datetime.time(8, 0), custom_food_name='Feed', quantity_ml=200)
+
+    def add_item(self, day, timing, food_name, **fields):
+        return DietItem.objects.create(scheduled_date=day, timing=timing, food_name=food_name, quantity_ml=100, **fields)
+
+    def copy(self, target_dates, **params):
+        return self.client.post('/api/diet-items/copy/', {
+            'source_date': self.source.isoformat(), 'target_dates': [d.isoformat() for d in target_dates], **params,
+        }, format='json')
+
+    def test_existing_slots_are_skipped_unless_disabled(self):
+        target = self.source + datetime.timedelta(days=1)
+        self.add_item(self.source, datetime.time(8, 0), 'Feed', is_administered=True)
+        self.add_item(self.source, datetime.time(12, 0), 'Snack')
+        self.add_item(target, datetime.time(8, 0), 'Feed')
+
+        response = self.copy([target])
+        self.assertEqual((response.status_code, response.data['created'], response.data['skipped']), (201, 1, 1))
+
+        response = self.copy([target], skip_existing=False)
+        self.assertEqual((response.data['created'], response.data['skipped']), (2, 0))
+        self.assertEqual(DietItem.objects.filter(scheduled_date=target).count(), 4)
+        self.assertFalse(DietItem.objects.filter(scheduled_date=target, is_administered=True).exists())
+
+    def test_week_span_shifts_every_day(self):
+        self.add_item(self.source, datetime.time(8, 0), 'Monday feed')
+        self.add_item(self.source + datetime.timedelta(days=6), datetime.time(20, 0), 'Sunday feed')
+        target = self.source + datetime.timedelta(days=14)
+
+        response = self.copy([target], span='week')
+
+        self.assertEqual(response.data['created'], 2)
+        copies = DietItem.objects.filter(scheduled_date__gte=target).order_by('scheduled_date')
+        self.assertEqual(
+            [(item.scheduled_date, item.food_name) for item in copies],
+            [(target, 'Monday feed'), (target + datetime.timedelta(days=6), 'Sunday feed')],
+        )
+
+    def test_overlapping_ranges_are_rejected(self):
+        self.add_item(self.source, datetime.time(8, 0), 'Feed')
+        week = datetime.timedelta(days=7)
+
+        self.assertEqual(self.copy([self.source + datetime.timedelta(days=3)], span='week').status_code, 400)
+        self.assertEqual(self.copy([self.source + week, self.source + week + datetime.timedelta(days=3)], span='week').status_code, 400)
+        self.assertEqual(self.copy([self.source]).status_code, 400)
+        self.assertEqual(DietItem.objects.count(), 1)
+
+    def test_template_item_given_late_is_not_duplicated(self):
+        target = self.source + datetime.timedelta(days=1)
+        # Given late, so recorded at 08:30; the target day already has its synced template item at 08:00
+        self.add_item(self.source, datetime.time(8, 30), 'Feed', source_template=self.template, is_administered=True)
+        self.add_item(target, datetime.time(8, 0), 'Feed', source_template=self.template)
+
+        response = self.copy([target])
+        self.assertEqual((response.data['created'], response.data['skipped']), (0, 1))
+
+        # Copied anyway, the extra item is ad-hoc so the date keeps one item per template
+        response = self.copy([target], skip_existing=False)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(DietItem.objects.filter(scheduled_date=target, source_template=self.template).count(), 1)
+        self.assertEqual(DietItem.objects.filter(scheduled_date=target, source_template__isnull=True).count(), 1)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.old_day = timezone.now().date() - datetime.timedelta(days=400)
+        self.template = ScheduledItemTemplate.objects.create(timing=datetime.time(8, 0), custom_food_name='Morning', quantity_ml=200)
+        DietItem.objects.create(
+            source_template=self.template, scheduled_date=self.old_day, timing=datetime.time(8, 0),
+            food_name='Morning', quantity_ml=200, is_administered=True,
+        )
+        DietItem.objects.create(scheduled_date=self.old_day, timing=datetime.time(14, 0), food_name='Ad-hoc', quantity_ml=50)
+
+    def archive(self):
+        call_command('archive_diet_items', older_than_days=30, stdout=StringIO())
+
+    def test_rows_inserted_while_archiving_are_not_deleted(self):
+        set_rows = DietDayArchive.set_rows
+
+        def set_rows_with_concurrent_insert(archive, rows):
+            DietItem.objects.create(scheduled_date=self.old_day, timing=datetime.time(20, 0), food_name='Late', quantity_ml=10)
+            set_rows(archive, rows)
+
+        with mock.patch.object(DietDayArchive, 'set_rows', set_rows_with_concurrent_insert):
+            self.archive()
+
+        self.assertEqual(DietDayArchive.objects.get(scheduled_date=self.old_day).item_count, 2)
+        self.assertEqual(list(DietItem.objects.values_list('food_name', flat=True)), ['Late'])
+
+        # The next run merges it into the day's archive
+        self.archive()
+        self.assertEqual(DietDayArchive.objects.get(scheduled_date=self.old_day).item_count, 3)
+        self.assertFalse(DietItem.objects.exists())
+
+    def test_archived_items_are_listed_read_only(self):
+        self.archive()
+        DietItem.objects.create(scheduled_date=self.old_day, timing=datetime.time(20, 0), food_name='Late', quantity_ml=10)
+
+        response = self.client.get('/api/diet-items/', {'date': self.old_day.isoformat()})
+
+        self.assertEqual(
+            [(item['food_name'], item['archived']) for item in response.json()],
+            [('Morning', True), ('Ad-hoc', True), ('Late', False)],
+        )
+
+    def test_copy_from_an_archived_day(self):
+        self.archive()
+        self.template.delete()
+        target = timezone.now().date() + datetime.timedelta(days=5)
+
+        response = self.client.post('/api/diet-items/copy/', {
+            'source_date': self.old_day.isoformat(), 'target_dates': [target.isoformat()],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        copies = DietItem.objects.filter(scheduled_date=target).order_by('timing')
+        self.assertEqual([item.food_name for item in copies], ['Morning', 'Ad-hoc'])
+        # Pending again, and unlinked from the template deleted after archiving
+        self.assertFalse(any(item.is_administered for item in copies))
+        self.assertIsNone(copies[0].source_template_id)
+
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def add_item(self, day, **fields):
+        defaults = {'timing': datetime.time(8, 0), 'food_name': 'Feed', 'quantity_ml': 100, 'calories': 150}
+        return DietItem.objects.create(scheduled_date=day, **{**defaults, **fields})
+
+    def trends(self, start, end, **params):
+        response = self.client.get('/api/analytics/nutrition/', {'start': start.isoformat(), 'end': end.isoformat(), **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_week_buckets_start_on_monday_and_month_buckets_on_the_first(self):
+        # 2024-01-03 is a Wednesday
+        for day in ['2024-01-03', '2024-01-07', '2024-01-08', '2024-02-05']:
+            self.add_item(datetime.date.fromisoformat(day))
+        start, end = datetime.date(2024, 1, 3), datetime.date(2024, 2, 5)
+
+        weeks = self.trends(start, end, bucket='week')['buckets']
+        self.assertEqual([b['start'] for b in weeks], ['2024-01-01', '2024-01-08', '2024-01-15', '2024-01-22', '2024-01-29', '2024-02-05'])
+        self.assertEqual([b['items_planned'] for b in weeks], [2, 1, 0, 0, 0, 1])
+
+        months = self.trends(start, end, bucket='month')['buckets']
+        self.assertEqual([b['start'] for b in months], ['2024-01-01', '2024-02-01'])
+        self.assertEqual([b['items_planned'] for b in months], [3, 1])
+
+    def test_null_nutrients_count_as_zero_and_only_administered_items_are_consumed(self):
+        day = datetime.date(2024, 3, 1)
+        self.add_item(day, calories=None, is_administered=True)
+        self.add_item(day, calories=200, protein_g=None, is_administered=True)
+        self.add_item(day, calories=300, is_skipped=True)
+
+        data = self.trends(day, day)
+        self.assertEqual(data['totals']['planned_calories'], 500)
+        self.assertEqual(data['totals']['consumed_calories'], 200)
+        self.assertEqual(data['totals']['items_skipped'], 1)
+        self.assertEqual(data['buckets'][0]['calorie_adherence'], 0.4)
+
+    def test_rolling_means_skip_buckets_without_items(self):
+        day = datetime.date(2024, 3, 1)
+        self.add_item(day, is_administered=True)
+        self.add_item(day + datetime.timedelta(days=2))
+
+        buckets = self.trends(day, day + datetime.timedelta(days=3), window=2)['buckets']
+        self.assertEqual([b['adherence'] for b in buckets], [1.0, None, 0.0, None])
+        self.assertEqual([b['rolling_adherence'] for b in buckets], [1.0, 1.0, 0.0, 0.0])
+        self.assertEqual([b['rolling_consumed_calories'] for b in buckets], [150.0, 150.0, 0.0, 0.0])
+
+    def test_archived_days_give_the_same_totals(self):
+        old_day = timezone.now().date() - datetime.timedelta(days=400)
+        self.add_item(old_day, is_administered=True)
+        self.add_item(old_day, timing=datetime.time(14, 0), calories=None, is_skipped=True)
+        self.add_item(old_day + datetime.timedelta(days=1), calories=250)
+        start, end = old_day - datetime.timedelta(days=1), old_day + datetime.timedelta(days=1)
+        before = self.trends(start, end)
+
+        call_command('archive_diet_items', older_than_days=30, stdout=StringIO())
+        self.assertFalse(DietItem.objects.exists())
+        cache.clear()  # Recompute from the archive aggregates
+        self.assertEqual(self.trends(start, end), before)
+        self.assertEqual(before['totals']['items_planned'], 3)
+
+    def test_cold_year_range_reads_versions_in_one_query(self):
+        start = datetime.date(2024, 1, 1)
+        for offset in range(0, 366, 30):
+            self.add_item(start + datetime.timedelta(days=offset))
+
+        get_date_versions([start])  # Creates the epoch token, once per version cache
+
+        # Version tokens (one read, no writes for never-written dates), hot items, archived days
+        with self.assertNumQueries(3):
+            self.trends(start, datetime.date(2024, 12, 31), bucket='month')
+
+    def test_write_inside_the_range_changes_the_cached_result(self):
+        day = datetime.date(2024, 3, 1)
+        item = self.add_item(day)
+        self.assertEqual(self.trends(day, day)['totals']['adherence'], 0.0)
+
+        self.client.post(f'/api/diet-items/{item.pk}/mark-administered/')
+        self.assertEqual(self.trends(day, day)['totals']['adherence'], 1.0)
+        self.assertEqual(self.trends(day, day)['totals']['consumed_calories'], 150.0)
+
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, MEDIA_DELETE_GRACE_SECONDS=0))
+
+    def add_item(self, content, **overrides):
+        response = self.client.post('/api/diet-items/', {
+            **item_payload(**overrides), 'image': SimpleUploadedFile('photo.png', content, content_type='image/png'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return DietItem.objects.get(pk=response.data['id'])
+
+    def delete_item(self, item):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/diet-items/{item.pk}/')
+
+    def test_identical_uploads_share_one_content_addressed_file(self):
+        content = png('red')
+        first, second = self.add_item(content), self.add_item(content)
+
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first.image.name, f'diet_images/{digest[:2]}/{digest}.png')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(os.listdir(os.path.dirname(first.image.path)), [f'{digest}.png'])
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        first, second = self.add_item(png('red')), self.add_item(png('red'))
+
+        self.delete_item(first)
+        self.assertTrue(default_storage.exists(second.image.name))
+        self.delete_item(second)
+        self.assertFalse(default_storage.exists(second.image.name))
+
+    def test_replaced_image_is_deleted(self):
+        item = self.add_item(png('red'))
+        old_name = item.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/diet-items/{item.pk}/', {
+                'image': SimpleUploadedFile('photo.png', png('blue'), content_type='image/png'),
+            }, format='multipart')
+
+        item.refresh_from_db()
+        self.assertNotEqual(item.image.name, old_name)
+        self.assertTrue(default_storage.exists(item.image.name))
+        self.assertFalse(default_storage.exists(old_name))
+
+    def test_archive_keeps_the_file_until_the_archive_is_deleted(self):
+        old_day = timezone.now().date() - datetime.timedelta(days=400)
+        name = self.add_item(png('red'), scheduled_date=old_day.isoformat()).image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_diet_items', older_than_days=30, stdout=StringIO())
+        self.assertFalse(DietItem.objects.exists())
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DietDayArchive.objects.get(scheduled_date=old_day).delete()
+        self.assertFalse(default_storage.exists(name))
+
+    def test_delete_keeps_a_file_reused_by_a_concurrent_upload(self):
+        content = png('red')
+        name = self.add_item(content).image.name
+        old = os.path.getmtime(default_storage.path(name)) - 3600
+
+        # An upload reused the file just before the delete, its row isn't committed yet
+        os.utime(default_storage.path(name), (old, old))
+        default_storage.save('diet_images/photo.png', ContentFile(content))
+        self.assertFalse(default_storage.delete_if_unused(name, lambda: False, grace=60))
+        self.assertEqual(default_storage.open(name).read(), content)
+
+        # An upload of the same bytes while the file is moved aside stores it again, and its row commits
+        def upload_during_delete():
+            default_storage.save('diet_images/photo.png', ContentFile(content))
+            return True
+
+        os.utime(default_storage.path(name), (old, old))
+        self.assertFalse(default_storage.delete_if_unused(name, upload_during_delete, grace=60))
+        self.assertEqual(default_storage.open(name).read(), content)
+        self.assertEqual(len(os.listdir(os.path.dirname(default_storage.path(name)))), 1)
+
+        # Unreferenced and unused for longer than the grace period
+        os.utime(default_storage.path(name), (old, old))
+        self.assertTrue(default_storage.delete_if_unused(name, lambda: False, grace=60))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_sweep_deletes_files_kept_by_the_grace_period(self):
+        item = self.add_item(png('red'))
+        name = item.image.name
+        with override_settings(MEDIA_DELETE_GRACE_SECONDS=3600):
+            self.delete_item(item)
+        self.assertTrue(default_storage.exists(name))
+        kept = self.add_item(png('blue')).image.name
+
+        call_command('sweep_media', grace_seconds=0, stdout=StringIO())
+
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(kept))
+
+    def test_media_view_conditional_and_range_requests(self):
+        content = png('red')
+        name = self.add_item(content).image.name
+        url = f'/media/{name}'
+        etag = f'"{hashlib.sha256(content).hexdigest()}"'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        partial = self.client.get(url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], f'bytes 0-3/{len(content)}')
+        self.assertEqual(b''.join(partial.streaming_content), content[:4])
+
+        unsatisfiable = self.client.get(url, HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], f'bytes */{len(content)}')
+
+        # If-Range with an outdated validator: the whole file instead of the range
+        stale = self.client.get(url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(b''.join(stale.streaming_content), content)
+
+
+class OptimisticConcurrencyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.item = DietItem.objects.create(
+            scheduled_date=datetime.date(2031, 1, 1), timing=datetime.time(8, 0), food_name='Feed', quantity_ml=200,
+        )
+
+    def test_every_save_bumps_the_version(self):
+        self.assertEqual(self.item.version, 1)
+        response = self.client.patch(f'/api/diet-items/{self.item.pk}/', {'quantity_ml': 250}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 2)
+
+    def test_update_with_current_version_applies(self):
+        response = self.client.patch(f'/api/diet-items/{self.item.pk}/', {'quantity_ml': 250, 'version': 1}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity_ml, self.item.version), (250, 2))
+
+    def test_update_with_stale_version_is_rejected(self):
+        self.client.patch(f'/api/diet-items/{self.item.pk}/', {'quantity_ml': 250}, format='json')
+        response = self.client.patch(f'/api/diet-items/{self.item.pk}/', {'quantity_ml': 100, 'version': 1}, format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_ml, 250)
+
+
+    def patch_with_concurrent_change(self, data):
+        get_object = DietItemViewSet.get_object
+
+        def get_object_then_administer(view):
+            instance = get_object(view)
+            # Another request marks the item administered after this one loaded it
+            DietItem.objects.filter(pk=instance.pk).update(is_administered=True, version=F('version') + 1)
+            return instance
+
+        with mock.patch.object(DietItemViewSet, 'get_object', get_object_then_administer):
+            return self.client.patch(f'/api/diet-items/{self.item.pk}/', data, format='json')
+
+    def test_patch_keeps_a_change_made_between_load_and_save(self):
+        response = self.patch_with_concurrent_change({'quantity_ml': 150})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_administered'])
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity_ml, self.item.is_administered, self.item.version), (150, True, 3))
+
+    def test_patch_with_the_loaded_version_conflicts_with_a_change_made_before_save(self):
+        response = self.patch_with_concurrent_change({'quantity_ml': 150, 'version': 1})
+
+        self.assertEqual(response.status_code, 409)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity_ml, self.item.is_administered), (200, True))
+
+    def test_status_change_only_writes_status_fields(self):
+        stale = DietItem.objects.get(pk=self.item.pk)
+        DietItem.objects.filter(pk=self.item.pk).update(quantity_ml=300)
+
+        views.apply_status_change(stale, 'administered')
+
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity_ml, self.item.is_administered), (300, True))
+
+
+class BatchMutationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.item = DietItem.objects.create(
+            scheduled_date=datetime.date(2031, 1, 1), timing=datetime.time(8, 0), food_name='Feed', quantity_ml=200,
+        )
+
+    def batch(self, mutations):
+        response = self.client.post('/api/diet-items/batch/', {'mutations': mutations}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_mutations_apply_in_order_and_refs_resolve(self):
+        data = self.batch([
+            {'op': 'create', 'ref': 'new', 'data': item_payload(food_name='Queued offline')},
+            {'op': 'patch', 'ref': 'new', 'data': {'quantity_ml': 120}},
+            {'op': 'status', 'ref': 'new', 'status': 'administered'},
+            {'op': 'delete', 'id': self.item.pk, 'version': 1},
+        ])
+
+        self.assertEqual(data['summary'], {'ok': 4, 'conflict': 0, 'not_found': 0, 'error': 0})
+        created = DietItem.objects.get(food_name='Queued offline')
+        self.assertEqual(created.quantity_ml, 120)
+        self.assertTrue(created.is_administered)
+        self.assertFalse(DietItem.objects.filter(pk=self.item.pk).exists())
+
+    def test_stale_version_is_a_conflict_and_the_rest_still_apply(self):
+        self.item.quantity_ml = 300
+        self.item.save()  # version 2
+
+        data = self.batch([
+            {'op': 'patch', 'id': self.item.pk, 'version': 1, 'data': {'quantity_ml': 100}},
+            {'op': 'status', 'id': self.item.pk, 'version': 2, 'status': 'skipped'},
+            {'op': 'delete', 'id': 999999},
+        ])
+
+        self.assertEqual([result['status'] for result in data['results']], ['conflict', 'ok', 'not_found'])
+        # The conflict reports the current item so the client can reconcile
+        self.assertEqual(data['results'][0]['item']['quantity_ml'], 300)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_ml, 300)
+        self.assertTrue(self.item.is_skipped)
+
+    def test_invalid_mutation_is_reported_per_item(self):
+        data = self.batch([
+            {'op': 'create', 'data': {'food_name': 'Missing fields'}},
+            {'op': 'status', 'id': self.item.pk, 'status': 'administered'},
+        ])
+
+        self.assertEqual([result['status'] for result in data['results']], ['error', 'ok'])
+        self.assertIn('timing', data['results'][0]['errors'])
+
+
+class ListCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.today = timezone.now().date()
+        self.item = DietItem.objects.create(
+            scheduled_date=self.today, timing=datetime.time(8, 0), food_name='Feed', quantity_ml=200,
+        )
+
+    def list_quantities(self):
+        response = self.client.get('/api/diet-items/', {'date': self.today.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        return [item['quantity_ml'] for item in response.json()]
+
+    def test_version_tokens_are_shared_across_processes(self):
+        self.list_quantities()
+        token = get_date_versions([self.today])[0]
+        # Another worker starts with an empty local cache but sees the same token
+        cache.clear()
+        self.assertEqual(get_date_versions([self.today]), [token])
+        self.assertIsNone(cache.get(f'{DATE_VERSION_PREFIX}{self.today.isoformat()}'))
+        self.assertEqual(caches['versions'].get(f'{DATE_VERSION_PREFIX}{self.today.isoformat()}'), token)
+
+    def test_write_invalidates_cached_list(self):
+        self.assertEqual(self.list_quantities(), [200])
+        self.client.patch(f'/api/diet-items/{self.item.pk}/', {'quantity_ml': 50}, format='json')
+
+        self.assertEqual(self.list_quantities(), [50])
+
+    def test_sync_reruns_only_after_template_change(self):
+        with mock.patch.object(DietItemViewSet, '_synchronize_template_items') as synchronize:
+            self.list_quantities()
+            self.list_quantities()
+            self.assertEqual(synchronize.call_count, 1)
+
+            bump_template_version()
+            self.list_quantities()
+            self.assertEqual(synchronize.call_count, 2)
+
+    @override_settings(DIET_ITEM_SYNC_TTL=0)
+    def test_sync_marker_expires(self):
+        with mock.patch.object(DietItemViewSet, '_synchronize_template_items') as synchronize:
+            self.list_quantities()
+            self.list_quantities()
+
+        self.assertEqual(synchronize.call_count, 2)
+
+
+@skipIf(renderers.orjson is None, 'orjson is not installed')
+class ORJSONRendererTests(SimpleTestCase):
+    def test_output_matches_drf_json_renderer(self):
+        administered_at = datetime.datetime(2031, 1, 1, 8, 5, 30, 123456, tzinfo=datetime.timezone.utc)
+        item = DietItem(
+            id=1, scheduled_date=datetime.date(2031, 1, 1), timing=datetime.time(8, 5, 30, 250000),
+            food_name='Jevity 1.5 Cal – 250 ml', quantity_ml=250, calories=375, protein_g=Decimal('15.94'),
+            description='Flush before\u2028and after', is_administered=True, administered_at=administered_at,
+            created_at=administered_at, updated_at=administered_at,
+        )
+        data = {
+            'items': DietItemSerializer([item], many=True).data,
+            'raw': {'decimal': Decimal('1.50'), 'time': item.timing, 'datetime': administered_at, 1: None},
+        }
+
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser_rejects_nan(self):
+        parser = renderers.ORJSONParser()
+        self.assertEqual(parser.parse(BytesIO(b'{"quantity_ml": 250}')), {'quantity_ml': 250})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"quantity_ml": NaN}'))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"food_name": "Feed", "quantity_ml": 250}' * 20
+
+    def process(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/api/diet-items/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_encoding_negotiation(self):
+        choose = CompressionMiddleware.choose_encoding
+        preferred = 'br' if middleware.brotli is not None else 'gzip'
+        self.assertEqual(choose('gzip'), 'gzip')
+        self.assertEqual(choose('gzip, br'), preferred)
+        self.assertEqual(choose('*'), preferred)
+        self.assertEqual(choose('*;q=0, gzip;q=0.5'), 'gzip')
+        self.assertIsNone(choose('gzip;q=0, br;q=0'))
+        self.assertIsNone(choose('*;q=0'))
+        self.assertIsNone(choose('identity'))
+        self.assertIsNone(choose(''))
+
+    def test_compresses_and_weakens_etag(self):
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = '"abc"'
+
+        response = self.process(response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_refused_encoding_is_left_uncompressed(self):
+        response = self.process(HttpResponse(self.body), accept_encoding='gzip;q=0')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+
+    def test_small_and_streaming_responses_are_left_alone(self):
+        small = self.process(HttpResponse(self.body[:100]))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(small.has_header('Vary'))
+
+        streaming = self.process(StreamingHttpResponse(iter([self.body])))
+        self.assertFalse(streaming.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(streaming.streaming_content), self.body)
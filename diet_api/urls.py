@@ -4,13 +4,15 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     DietItemViewSet,
     FoodFormulaViewSet,         # Import new viewset
-    ScheduledItemTemplateViewSet # Import new viewset
+    ScheduledItemTemplateViewSet, # Import new viewset
+    AnalyticsViewSet,
 )
 
 router = DefaultRouter()
 router.register(r'diet-items', DietItemViewSet, basename='dietitem')
 router.register(r'food-formulas', FoodFormulaViewSet, basename='foodformula') # Register new viewset
 router.register(r'schedule-templates', ScheduledItemTemplateViewSet, basename='scheduletemplate') # Register new viewset
+router.register(r'analytics', AnalyticsViewSet, basename='analytics') # analytics/nutrition/
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,11 +2,17 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException, ValidationError
 from django.utils import timezone
-from django.db import transaction, models as db_models
+from django.db import DatabaseError, transaction, models as db_models
 from django.shortcuts import get_object_or_404
-from .models import FoodFormula, ScheduledItemTemplate, DietItem
-from .serializers import FoodFormulaSerializer, ScheduledItemTemplateSerializer, DietItemSerializer
+from django.conf import settings
+from .models import FoodFormula, ScheduledItemTemplate, DietItem, DietDayArchive
+from .serializers import FoodFormulaSerializer, ScheduledItemTemplateSerializer, DietItemSerializer, DietItemCopySerializer, DietItemBatchSerializer
+from .cache import bump_date_versions, get_date_versions, get_template_version, get_or_build, version_cache
+from .idempotency import idempotent
+from .search import search_formulas
+from . import sync
 import datetime
 
 # --- FoodFormulaViewSet and ScheduledItemTemplateViewSet remain the same ---
@@ -14,10 +20,70 @@ class FoodFormulaViewSet(viewsets.ModelViewSet):
     queryset = FoodFormula.objects.all().order_by('name')
     serializer_class = FoodFormulaSerializer
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked prefix, substring and fuzzy name search for pickers: ?q=<text>&limit=<1-50, default 10>."""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'status': 'failed', 'message': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        formulas = search_formulas(request.query_params.get('q', ''), limit)
+        return Response(self.get_serializer(formulas, many=True).data)
+
 class ScheduledItemTemplateViewSet(viewsets.ModelViewSet):
     queryset = ScheduledItemTemplate.objects.all().order_by('timing')
     serializer_class = ScheduledItemTemplateSerializer
 
+    # --- Sync preview (dry run) ---
+    # Returns the create/update/delete plan the daily sync would apply over a date
+    # range, optionally with a proposed template change, without writing anything.
+    #   GET  sync-preview/?start=&end=        current templates vs stored items
+    #   POST sync-preview/?start=&end=        body = proposed NEW template
+    #   POST {id}/sync-preview/?start=&end=   body = proposed edit of template {id} (same payload as PUT)
+    #   DELETE {id}/sync-preview/?start=&end= proposed deletion of template {id}
+    SYNC_PREVIEW_DEFAULT_DAYS = 30
+    SYNC_PREVIEW_MAX_DAYS = 366
+
+    def _preview_dates(self, request):
+        """Parses start/end; the live sync only runs for today onwards, so the range is clamped to today."""
+        today = timezone.now().date()
+        try:
+            start = datetime.datetime.strptime(request.query_params['start'], '%Y-%m-%d').date() if 'start' in request.query_params else today
+            end = datetime.datetime.strptime(request.query_params['end'], '%Y-%m-%d').date() if 'end' in request.query_params else start + datetime.timedelta(days=self.SYNC_PREVIEW_DEFAULT_DAYS - 1)
+        except ValueError:
+            raise ValidationError({'status': 'failed', 'message': 'start and end must be dates in YYYY-MM-DD format.'})
+        start = max(start, today)
+        if end < start:
+            raise ValidationError({'status': 'failed', 'message': 'end must be on or after start (and today).'})
+        if (end - start).days + 1 > self.SYNC_PREVIEW_MAX_DAYS:
+            raise ValidationError({'status': 'failed', 'message': f'Preview range is limited to {self.SYNC_PREVIEW_MAX_DAYS} days.'})
+        return start, end
+
+    def _preview_response(self, request, templates):
+        start, end = self._preview_dates(request)
+        dates = sync.date_range(start, end)
+        plan = sync.plan_sync(templates, sync.snapshot_items(dates), dates)
+        return Response({'start': start, 'end': end, **sync.describe_plan(plan)})
+
+    @action(detail=False, methods=['get', 'post'], url_path='sync-preview')
+    def sync_preview(self, request):
+        templates = sync.snapshot_templates()
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            templates.append(sync.template_snapshot(ScheduledItemTemplate(**serializer.validated_data)))
+        return self._preview_response(request, templates)
+
+    @action(detail=True, methods=['post', 'delete'], url_path='sync-preview')
+    def sync_preview_change(self, request, pk=None):
+        instance = self.get_object()
+        templates = [t for t in sync.snapshot_templates() if t.id != instance.id]
+        if request.method == 'POST':
+            serializer = self.get_serializer(instance, data=request.data)
+            serializer.is_valid(raise_exception=True)
+            templates.append(sync.template_snapshot(ScheduledItemTemplate(id=instance.id, **serializer.validated_data)))
+        return self._preview_response(request, templates)
+
 
 # # --- DietItemViewSet with Smart Sync ---
 # class DietItemViewSet(viewsets.ModelViewSet):
@@ -45,31 +111,48 @@ class ScheduledItemTemplateViewSet(viewsets.ModelViewSet):
 #         queryset = queryset.filter(scheduled_date=target_date)
 #         return queryset.order_by('timing')
 
+class VersionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This item was changed since you loaded it. Reload it and try again.'
+    default_code = 'version_conflict'
+
+
+def apply_status_change(item, new_status):
+    """
+    Status rules shared by the mark-* actions and batch 'status' mutations.
+    Saves the item and returns None, or returns an error message if the change isn't allowed.
+    """
+    if new_status == 'administered':
+        if item.is_skipped: return 'Item is already marked as skipped.'
+        item.is_administered = True; item.administered_at = timezone.now(); item.is_skipped = False
+    elif new_status == 'skipped':
+        if item.is_administered: return 'Item is already marked as administered.'
+        item.is_skipped = True; item.is_administered = False; item.administered_at = None
+    else:
+        item.is_skipped = False; item.is_administered = False; item.administered_at = None
+    # Only the status fields, so a concurrent edit of the other fields isn't overwritten
+    item.save(update_fields=['is_administered', 'administered_at', 'is_skipped'])
+    return None
+
+
 class DietItemViewSet(viewsets.ModelViewSet):
     serializer_class = DietItemSerializer
+    LIST_CACHE_PREFIX = 'diet_items:list:'
+    SYNCED_PREFIX = 'diet_items:synced:'
+
+    def _get_list_date(self):
+        """The ?date=YYYY-MM-DD of a list request, or None if missing/invalid."""
+        try:
+            return datetime.datetime.strptime(self.request.query_params.get('date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return None
 
     def get_queryset(self):
-        # Handle LIST action separately with date filtering and sync
+        # Handle LIST action separately with date filtering (the sync runs in list())
         if self.action == 'list':
-            date_param = self.request.query_params.get('date')
-            
-            if not date_param:
-                return DietItem.objects.none()
-            
-            try:
-                target_date = datetime.datetime.strptime(date_param, '%Y-%m-%d').date()
-            except ValueError:
+            target_date = self._get_list_date()
+            if not target_date:
                 return DietItem.objects.none()
-
-            # Sync logic only for today/future dates
-            today = timezone.now().date()
-            if target_date >= today:
-                try:
-                    with transaction.atomic():
-                        self._synchronize_template_items(target_date)
-                except Exception as e:
-                    print(f"Sync error: {e}")
-
             return DietItem.objects.filter(
                 scheduled_date=target_date
             ).order_by('timing')
@@ -79,6 +162,69 @@ class DietItemViewSet(viewsets.ModelViewSet):
         return DietItem.objects.all()
 
 
+    def list(self, request, *args, **kwargs):
+        target_date = self._get_list_date()
+        if not target_date:
+            return Response([])
+
+        # Sync logic only for today/future dates
+        if target_date >= timezone.now().date():
+            self._sync_if_stale(target_date)
+
+        # The serialized list is cached per date version: every write to the date (signals,
+        # sync, copy, admin and archive bulk writes) replaces the version, so no explicit
+        # invalidation is needed. Image URLs are absolute, hence the scheme/host in the key.
+        date_version = get_date_versions([target_date])[0]
+        cache_key = f"{self.LIST_CACHE_PREFIX}{target_date}:{date_version}:{request.scheme}://{request.get_host()}"
+        data = get_or_build(
+            cache_key, lambda: self._build_list_data(target_date),
+            timeout=getattr(settings, 'DIET_ITEM_LIST_CACHE_TIMEOUT', 60 * 60),
+            lock_timeout=getattr(settings, 'DIET_ITEM_LIST_LOCK_TIMEOUT', 10),
+        )
+        return Response(data)
+
+    def _build_list_data(self, target_date):
+        items = list(self.filter_queryset(self.get_queryset()))
+        # Past days may have been moved to the cold store by archive_diet_items;
+        # serve them from there (read-only), merged with anything still in the hot table.
+        if target_date < timezone.now().date():
+            archive = DietDayArchive.objects.filter(scheduled_date=target_date).first()
+            if archive:
+                items = sorted(archive.get_items() + items, key=lambda item: item.timing)
+        serializer = self.get_serializer(items, many=True)
+        return list(serializer.data)
+
+    def _sync_if_stale(self, target_date):
+        """
+        Runs the template sync for a date unless it already ran against the current
+        templates and nothing has written to the date since (both tracked by cache versions),
+        within the last DIET_ITEM_SYNC_TTL seconds. The marker and lock live in the shared
+        version cache, so concurrent requests in any worker wait for one sync instead of racing it.
+        """
+        shared = version_cache()
+        sync_ttl = getattr(settings, 'DIET_ITEM_SYNC_TTL', 10 * 60)
+        # Read once: a template change during the sync must not be recorded as synced
+        template_version = get_template_version()
+
+        def synced_key():
+            return f"{self.SYNCED_PREFIX}{target_date}:{template_version}:{get_date_versions([target_date])[0]}"
+
+        def run_sync():
+            try:
+                with transaction.atomic():
+                    self._synchronize_template_items(target_date)
+            except Exception as e:
+                print(f"Sync error: {e}")
+                return None # Not cached, so the next request retries
+            # The sync's own writes replaced the date version; the result is in sync under that one too
+            shared.set(synced_key(), True, timeout=sync_ttl)
+            return True
+
+        get_or_build(
+            synced_key(), run_sync, timeout=sync_ttl,
+            lock_timeout=getattr(settings, 'DIET_ITEM_LIST_LOCK_TIMEOUT', 10), cache=shared,
+        )
+
     def _synchronize_template_items(self, target_date):
         """
         Synchronizes PENDING DietItems for a given date with the current
@@ -86,114 +232,20 @@ class DietItemViewSet(viewsets.ModelViewSet):
         in template, removes orphaned pending items.
         Does NOT touch administered/skipped items or manually added items.
         Does NOT overwrite manually edited descriptions/nutrients/images on pending items.
+        The plan itself is computed by sync.plan_sync (shared with the preview endpoint).
         """
         print(f"--- Syncing template items for {target_date} ---")
-        current_templates = ScheduledItemTemplate.objects.all()
-        # Fetch only PENDING items originating from a template for potential modification/deletion
-        pending_template_items = DietItem.objects.filter(
-            scheduled_date=target_date,
-            source_template__isnull=False,
-            is_administered=False,
-            is_skipped=False
-        )
-        # Fetch IDs of non-pending items to avoid regenerating them
-        non_pending_template_ids = set(
-            DietItem.objects.filter(
-                scheduled_date=target_date,
-                source_template__isnull=False
-            ).exclude(
-                is_administered=False, is_skipped=False # Exclude pending items
-            ).values_list('source_template_id', flat=True)
-        )
-
-        templates_dict = {template.id: template for template in current_templates}
-        pending_items_dict = {item.source_template_id: item for item in pending_template_items}
-
-        items_to_create = []
-        items_to_update = []
-        ids_to_delete = []
-
-        # 1. Process current templates: Add missing or identify updates for PENDING items
-        for template_id, template in templates_dict.items():
-            pending_item = pending_items_dict.get(template_id)
-
-            # Skip if an item from this template exists and is NOT pending
-            if template_id in non_pending_template_ids:
-                continue
-
-            # Determine current details from template
-            # Use get_display_name() for consistency
-            food_name = template.get_display_name()
-            quantity = template.quantity_ml
-            # Get other details primarily from template, fallback to formula only if template field is null/blank
-            calories = template.calories if template.calories is not None else (template.food_formula.default_calories if template.food_formula else None)
-            protein = template.protein_g if template.protein_g is not None else (template.food_formula.default_protein_g if template.food_formula else None)
-            carbs = template.carbs_g if template.carbs_g is not None else (template.food_formula.default_carbs_g if template.food_formula else None)
-            fat = template.fat_g if template.fat_g is not None else (template.food_formula.default_fat_g if template.food_formula else None)
-            # Template description takes priority if present
-            description = template.description if template.description else (template.food_formula.default_description if template.food_formula else '')
-
-
-            if pending_item:
-                # Template exists, corresponding PENDING item exists: Check for updates to CORE fields
-                needs_update = False
-                # Check fields that should reflect the template directly
-                if pending_item.timing != template.timing: pending_item.timing = template.timing; needs_update = True
-                if pending_item.food_name != food_name: pending_item.food_name = food_name; needs_update = True # Update name based on template logic
-                if pending_item.quantity_ml != quantity: pending_item.quantity_ml = quantity; needs_update = True
-                if pending_item.source_formula != template.food_formula: pending_item.source_formula = template.food_formula; needs_update = True
-
-                # Check optional fields ONLY if the user hasn't likely edited them
-                # Heuristic: If the pending item's value matches the OLD template/formula value, update it.
-                # This is complex. Simpler: ONLY update core fields above, leave nutrients/desc alone.
-                # Let's stick to updating core fields only for now.
-                # if pending_item.calories != calories: pending_item.calories = calories; needs_update = True
-                # if pending_item.protein_g != protein: pending_item.protein_g = protein; needs_update = True
-                # if pending_item.carbs_g != carbs: pending_item.carbs_g = carbs; needs_update = True
-                # if pending_item.fat_g != fat: pending_item.fat_g = fat; needs_update = True
-                # if pending_item.description != description: pending_item.description = description; needs_update = True
-
-
-                if needs_update:
-                    print(f"Sync: Marking item ID {pending_item.id} (from template {template_id}) for update.")
-                    items_to_update.append(pending_item)
-            else:
-                # Template exists, but no corresponding item (pending or otherwise) exists: Create it
-                 print(f"Sync: Marking item from template {template_id} for creation.")
-                 items_to_create.append(
-                    DietItem(
-                        source_template=template, source_formula=template.food_formula,
-                        scheduled_date=target_date, timing=template.timing,
-                        food_name=food_name, quantity_ml=quantity, calories=calories,
-                        protein_g=protein, carbs_g=carbs, fat_g=fat, description=description,
-                        is_administered=False, is_skipped=False
-                    )
-                )
-
-        # 2. Process existing PENDING items: Identify deletions if template is gone
-        for template_id, pending_item in pending_items_dict.items():
-            if template_id not in templates_dict:
-                # This pending item's template no longer exists: Delete the PENDING item
-                print(f"Sync: Marking PENDING item ID {pending_item.id} (from template {template_id}) for deletion.")
-                ids_to_delete.append(pending_item.id)
-
-        # 3. Perform database operations
-        if ids_to_delete:
-            deleted_count, _ = DietItem.objects.filter(id__in=ids_to_delete).delete()
-            print(f"Sync deleted {deleted_count} orphaned pending items.")
-        if items_to_create:
-            created_items = DietItem.objects.bulk_create(items_to_create, ignore_conflicts=True)
-            print(f"Sync created {len(created_items)} new items from template.")
-        if items_to_update:
-            # Define ONLY the core fields to update during sync
-            update_fields = ['timing', 'food_name', 'quantity_ml', 'source_formula']
-            updated_count = DietItem.objects.bulk_update(items_to_update, update_fields)
-            print(f"Sync updated {updated_count} pending items from template.")
+        sync.synchronize_dates([target_date])
         print(f"--- Sync complete for {target_date} ---")
 
     # --- Standard Actions (Create, Update, Destroy, Status Changes) ---
     # These operate on specific DietItem instances via their PK
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        # Retries carrying the same Idempotency-Key replay the first response
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         # For adding Ad-hoc items
         print(f"--- Creating Ad-hoc DietItem ---")
@@ -205,39 +257,237 @@ class DietItemViewSet(viewsets.ModelViewSet):
         print(f"--- Updating DietItem pk={instance.pk} ---")
         # Add logic here if you want to mark an item as 'manually_modified'
         # instance.manually_modified = True # If you add such a field
-        serializer.save()
+        expected_version = self.request.data.get('version')
+        with transaction.atomic():
+            # Lock and re-read the row: the instance loaded for validation may already be stale.
+            # If the client sent the version it edited, refuse to overwrite newer changes.
+            locked = DietItem.objects.select_for_update().get(pk=instance.pk)
+            if expected_version not in (None, '') and str(expected_version) != str(locked.version):
+                raise VersionConflict()
+            serializer.instance = locked
+            if serializer.partial:
+                # PATCH writes only the fields it sent, so concurrent changes to the others survive
+                for attr, value in serializer.validated_data.items():
+                    setattr(locked, attr, value)
+                locked.save(update_fields=list(serializer.validated_data))
+            else:
+                serializer.save()
 
     def perform_destroy(self, instance):
         # For DELETE requests
         print(f"--- Deleting DietItem pk={instance.pk} ---")
         instance.delete()
 
+    # --- Copy day/week ---
+    COPY_BATCH_SIZE = 500 # Rows per INSERT in bulk_create
+
+    @action(detail=False, methods=['post'], url_path='copy')
+    @idempotent
+    def copy_items(self, request):
+        """
+        Clones every DietItem (template-derived and ad-hoc) of a source day/week onto
+        each target start date, with status reset to pending, in one transaction.
+        """
+        serializer = DietItemCopySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        source_start, source_end = params['source_date'], params['source_end']
+        span = source_end - source_start
+        print(f"--- Copying DietItems {source_start}..{source_end} to {len(params['target_dates'])} target(s) ---")
+
+        source_items = list(DietItem.objects.filter(
+            scheduled_date__gte=source_start, scheduled_date__lte=source_end
+        ).order_by('scheduled_date', 'timing'))
+        # Source days moved to the cold store by archive_diet_items are copied from there
+        archived_items = [
+            item
+            for archive in DietDayArchive.objects.filter(scheduled_date__gte=source_start, scheduled_date__lte=source_end)
+            for item in archive.get_items()
+        ]
+        if archived_items:
+            # Archived rows may point at templates/formulas deleted since; copies are unlinked from those
+            live_templates = set(ScheduledItemTemplate.objects.filter(
+                id__in={item.source_template_id for item in archived_items}).values_list('id', flat=True))
+            live_formulas = set(FoodFormula.objects.filter(
+                id__in={item.source_formula_id for item in archived_items}).values_list('id', flat=True))
+            for item in archived_items:
+                if item.source_template_id not in live_templates:
+                    item.source_template_id = None
+                if item.source_formula_id not in live_formulas:
+                    item.source_formula_id = None
+            source_items = sorted(source_items + archived_items, key=lambda item: (item.scheduled_date, item.timing))
+
+        target_dates = set()
+        for target_start in params['target_dates']:
+            target_dates.update(sync.date_range(target_start, target_start + span))
+        # A date holds at most one item per template (the sync updates that one in place), so a
+        # template-derived item is matched by its template as well as by its (timing, name) slot:
+        # a feed given late keeps its template but not its timing.
+        existing_slots, existing_template_items = set(), set()
+        for target_date, timing, food_name, template_id in DietItem.objects.filter(
+            scheduled_date__in=target_dates
+        ).values_list('scheduled_date', 'timing', 'food_name', 'source_template_id'):
+            existing_slots.add((target_date, timing, food_name))
+            if template_id is not None:
+                existing_template_items.add((target_date, template_id))
+
+        items_to_create = []
+        skipped = 0
+        for target_start in params['target_dates']:
+            offset = target_start - source_start
+            for item in source_items:
+                target_date = item.scheduled_date + offset
+                template_id = item.source_template_id
+                has_template_item = template_id is not None and (target_date, template_id) in existing_template_items
+                if params['skip_existing'] and (has_template_item or (target_date, item.timing, item.food_name) in existing_slots):
+                    skipped += 1
+                    continue
+                if has_template_item:
+                    template_id = None # Kept as an ad-hoc extra; the date's template item stays the synced one
+                items_to_create.append(DietItem(
+                    source_template_id=template_id, source_formula_id=item.source_formula_id,
+                    scheduled_date=target_date, timing=item.timing, food_name=item.food_name,
+                    quantity_ml=item.quantity_ml, calories=item.calories, protein_g=item.protein_g,
+                    carbs_g=item.carbs_g, fat_g=item.fat_g, description=item.description,
+                    image=item.image.name, # Shares the stored file, no re-upload
+                    is_administered=False, administered_at=None, is_skipped=False
+                ))
+
+        with transaction.atomic():
+            created = DietItem.objects.bulk_create(items_to_create, batch_size=self.COPY_BATCH_SIZE)
+        # bulk_create sends no signals
+        bump_date_versions(target_dates)
+        print(f"Copy created {len(created)} items, skipped {skipped} existing slots.")
+        return Response({
+            'status': 'success',
+            'created': len(created),
+            'skipped': skipped,
+            'source_start': source_start,
+            'source_end': source_end,
+            'target_dates': params['target_dates'],
+        }, status=status.HTTP_201_CREATED)
+
     # Status change actions
     @action(detail=True, methods=['post'], url_path='mark-administered')
+    @idempotent
     def mark_administered(self, request, pk=None):
         print(f"--- Attempting mark_administered for DietItem pk={pk} ---")
         item = get_object_or_404(DietItem, pk=pk)
-        if not item.is_skipped:
-            item.is_administered = True; item.administered_at = timezone.now(); item.is_skipped = False; item.save()
-            print(f"Marked pk={pk} as administered.")
-            return Response(self.get_serializer(item).data)
-        else: return Response({'status': 'failed', 'message': 'Item is already marked as skipped.'}, status=status.HTTP_400_BAD_REQUEST)
+        error = apply_status_change(item, 'administered')
+        if error: return Response({'status': 'failed', 'message': error}, status=status.HTTP_400_BAD_REQUEST)
+        print(f"Marked pk={pk} as administered.")
+        return Response(self.get_serializer(item).data)
 
     @action(detail=True, methods=['post'], url_path='mark-skipped')
+    @idempotent
     def mark_skipped(self, request, pk=None):
         print(f"--- Attempting mark_skipped for DietItem pk={pk} ---")
         item = get_object_or_404(DietItem, pk=pk)
-        if not item.is_administered:
-            item.is_skipped = True; item.is_administered = False; item.administered_at = None; item.save()
-            print(f"Marked pk={pk} as skipped.")
-            return Response(self.get_serializer(item).data)
-        else: return Response({'status': 'failed', 'message': 'Item is already marked as administered.'}, status=status.HTTP_400_BAD_REQUEST)
+        error = apply_status_change(item, 'skipped')
+        if error: return Response({'status': 'failed', 'message': error}, status=status.HTTP_400_BAD_REQUEST)
+        print(f"Marked pk={pk} as skipped.")
+        return Response(self.get_serializer(item).data)
 
     @action(detail=True, methods=['post'], url_path='mark-pending')
+    @idempotent
     def mark_pending(self, request, pk=None):
         print(f"--- Attempting mark_pending for DietItem pk={pk} ---")
         item = get_object_or_404(DietItem, pk=pk)
-        item.is_skipped = False; item.is_administered = False; item.administered_at = None; item.save()
+        apply_status_change(item, 'pending')
         print(f"Marked pk={pk} as pending.")
         return Response(self.get_serializer(item).data)
 
+    # --- Offline batch ---
+    @action(detail=False, methods=['post'], url_path='batch')
+    @idempotent
+    def batch(self, request):
+        """
+        Applies an ordered list of mutations (create/patch/delete/status) in one transaction.
+        Each mutation runs in its own savepoint, so a conflict or error is reported for that
+        mutation while the rest still apply. A mutation carrying a version is only applied if
+        it matches the stored row (optimistic concurrency); otherwise the current item is
+        returned as a conflict.
+        """
+        serializer = DietItemBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        mutations = serializer.validated_data['mutations']
+        print(f"--- Applying batch of {len(mutations)} DietItem mutations ---")
+
+        refs = {} # client ref -> id of items created in this batch
+        results = []
+        with transaction.atomic():
+            for index, mutation in enumerate(mutations):
+                try:
+                    with transaction.atomic():
+                        result = self._apply_mutation(mutation, refs)
+                except DatabaseError as e:
+                    result = {'status': 'error', 'errors': {'detail': str(e)}}
+                results.append({'index': index, 'op': mutation['op'], **result})
+
+        summary = {key: 0 for key in ('ok', 'conflict', 'not_found', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+        print(f"Batch results: {summary}")
+        return Response({'results': results, 'summary': summary})
+
+    def _apply_mutation(self, mutation, refs):
+        op, data = mutation['op'], mutation['data']
+        context = self.get_serializer_context()
+
+        if op == 'create':
+            serializer = DietItemSerializer(data=data, context=context)
+            if not serializer.is_valid():
+                return {'status': 'error', 'errors': serializer.errors}
+            item = serializer.save()
+            if 'ref' in mutation:
+                refs[mutation['ref']] = item.pk
+            return {'status': 'ok', 'id': item.pk, 'item': serializer.data}
+
+        pk = mutation['id'] if 'id' in mutation else refs.get(mutation['ref'])
+        item = DietItem.objects.select_for_update().filter(pk=pk).first() if pk is not None else None
+        if item is None:
+            return {'status': 'not_found', 'id': pk}
+        if 'version' in mutation and mutation['version'] != item.version:
+            return {'status': 'conflict', 'id': pk, 'item': DietItemSerializer(item, context=context).data}
+
+        if op == 'delete':
+            item.delete()
+            return {'status': 'ok', 'id': pk}
+        if op == 'status':
+            error = apply_status_change(item, mutation['status'])
+            if error:
+                return {'status': 'error', 'id': pk, 'errors': {'detail': error}}
+            return {'status': 'ok', 'id': pk, 'item': DietItemSerializer(item, context=context).data}
+        serializer = DietItemSerializer(item, data=data, partial=True, context=context)
+        if not serializer.is_valid():
+            return {'status': 'error', 'id': pk, 'errors': serializer.errors}
+        serializer.save()
+        return {'status': 'ok', 'id': pk, 'item': serializer.data}
+
+
+# --- Analytics ---
+class AnalyticsViewSet(viewsets.ViewSet):
+    MAX_RANGE_DAYS = 3660 # ~10 years
+
+    @action(detail=False, methods=['get'])
+    def nutrition(self, request):
+        """
+        Planned vs. consumed nutrient totals, adherence and skipped-feed rates per bucket.
+        Query params: start, end (YYYY-MM-DD, default last 30 days), bucket=day|week|month, window (rolling buckets).
+        """
+        from . import analytics # Deferred: keeps NumPy out of worker startup
+        today = timezone.now().date()
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in analytics.BUCKETS:
+            return Response({'status': 'failed', 'message': f"bucket must be one of: {', '.join(analytics.BUCKETS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            end = datetime.datetime.strptime(request.query_params['end'], '%Y-%m-%d').date() if 'end' in request.query_params else today
+            start = datetime.datetime.strptime(request.query_params['start'], '%Y-%m-%d').date() if 'start' in request.query_params else end - datetime.timedelta(days=29)
+            window = int(request.query_params['window']) if 'window' in request.query_params else None
+        except ValueError:
+            return Response({'status': 'failed', 'message': 'start/end must be YYYY-MM-DD dates and window an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start or (end - start).days + 1 > self.MAX_RANGE_DAYS:
+            return Response({'status': 'failed', 'message': f'end must be on or after start, and the range at most {self.MAX_RANGE_DAYS} days.'}, status=status.HTTP_400_BAD_REQUEST)
+        if window is not None and window < 1:
+            return Response({'status': 'failed', 'message': 'window must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(analytics.nutrition_trends(start, end, bucket, window))
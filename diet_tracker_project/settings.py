@@ -8,8 +8,9 @@ settings from environment variables.
 
 from pathlib import Path
 import os
-import dj_database_url         # To parse DATABASE_URL environment variable
-from dotenv import load_dotenv # To load .env file for local development
+from corsheaders.defaults import default_headers
+# dj_database_url and dotenv are imported below only when they are needed,
+# to keep worker/manage.py startup light (see `manage.py startup_profile`).
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -18,7 +19,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Load environment variables from .env file if it exists (mainly for local development)
 # Looks for .env in the parent directory of this settings file (i.e., the project root)
 dotenv_path = BASE_DIR / '.env'
-load_dotenv(dotenv_path=dotenv_path) # Load variables from .env file
+if dotenv_path.exists(): # Not present on Render, so skip importing python-dotenv there
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=dotenv_path) # Load variables from .env file
 
 # --- Core Security Settings ---
 
@@ -47,6 +50,12 @@ ALLOWED_HOSTS = [host.strip() for host in allowed_hosts_str.split(',') if host.s
 # ALLOWED_HOSTS.append('.onrender.com')
 
 
+# API-only mode: set DJANGO_API_ONLY=True for workers that only serve /api/.
+# Skips the admin, sessions and messages apps/middleware and DRF's browsable API,
+# which cuts import and boot time (measure with `manage.py bench_cold_start`).
+API_ONLY = os.environ.get('DJANGO_API_ONLY', 'False').lower() in ['true', '1']
+
+
 # --- Application Definition ---
 
 INSTALLED_APPS = [
@@ -70,6 +79,9 @@ MIDDLEWARE = [
     # WhiteNoise Middleware: Serves static files efficiently in production.
     # Place it right after SecurityMiddleware.
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Compression: brotli/gzip for API responses (static files are pre-compressed by WhiteNoise above).
+    # Must come before anything that reads or modifies the response body.
+    'diet_api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # CORS Middleware: Handle Cross-Origin Resource Sharing. Place high up.
     'corsheaders.middleware.CorsMiddleware',
@@ -100,6 +112,17 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'diet_tracker_project.wsgi.application'
 
+if API_ONLY:
+    _browser_only_apps = {'django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages'}
+    _browser_only_middleware = {
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+    }
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in _browser_only_apps]
+    MIDDLEWARE = [mw for mw in MIDDLEWARE if mw not in _browser_only_middleware]
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove('django.contrib.messages.context_processors.messages')
+
 
 # --- Database ---
 # https://docs.djangoproject.com/en/stable/ref/settings/#databases
@@ -117,6 +140,7 @@ DATABASES = {
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
     # Use dj_database_url to parse the database URL from the environment
+    import dj_database_url
     DATABASES['default'] = dj_database_url.config(
         default=DATABASE_URL,
         conn_max_age=600,          # Optional: Number of seconds database connections should persist
@@ -125,6 +149,91 @@ if DATABASE_URL:
     )
 
 
+# --- Django REST Framework ---
+# https://www.django-rest-framework.org/api-guide/settings/
+# JSON goes through orjson (diet_api/renderers.py); swap these back to
+# rest_framework.renderers.JSONRenderer / parsers.JSONParser to use DRF's json-module classes.
+JSON_RENDERER_CLASS = 'diet_api.renderers.ORJSONRenderer'
+JSON_PARSER_CLASS = 'diet_api.renderers.ORJSONParser'
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [JSON_RENDERER_CLASS, 'rest_framework.renderers.BrowsableAPIRenderer'],
+    'DEFAULT_PARSER_CLASSES': [
+        JSON_PARSER_CLASS,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+if API_ONLY:
+    # No sessions or browsable API in API-only mode
+    REST_FRAMEWORK.update({
+        'DEFAULT_RENDERER_CLASSES': [JSON_RENDERER_CLASS],
+        'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.BasicAuthentication'],
+    })
+
+
+# --- Caches ---
+# https://docs.djangoproject.com/en/stable/topics/cache/
+# Local-memory caches are per process. LocMemCache evicts least-recently-used
+# entries once MAX_ENTRIES is reached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'diet-tracker-default',
+        # Analytics results and serialized DietItem day lists, keyed by the shared version tokens
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000))},
+    },
+    # Date/template version tokens and the template sync markers (diet_api/cache.py). Must be
+    # shared by all worker processes, so a write handled by one worker invalidates what every
+    # other worker cached from the date. MAX_ENTRIES is far above the number of live tokens, so
+    # culling only removes expired sync markers. The table is created by migration 0009 (or
+    # `manage.py createcachetable`).
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'diet_api_version_cache',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('VERSION_CACHE_MAX_ENTRIES', 50000))},
+    },
+    # Stored responses for requests sent with an Idempotency-Key header. Must be shared by all
+    # worker processes (gunicorn WEB_CONCURRENCY > 1): a retry can reach any worker, and a
+    # per-process LocMemCache would run the request again there. The table is created by
+    # migration 0009 (or `manage.py createcachetable`).
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'diet_api_idempotency_cache',
+        'TIMEOUT': int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('IDEMPOTENCY_MAX_KEYS', 10000))},
+    },
+}
+
+# --- Idempotency-Key handling (diet_api/idempotency.py) ---
+IDEMPOTENCY_CACHE_ALIAS = 'idempotency'
+IDEMPOTENCY_KEY_TTL = CACHES['idempotency']['TIMEOUT'] # Seconds a stored response can be replayed
+IDEMPOTENCY_LOCK_TIMEOUT = 30 # Seconds an in-flight request holds its key
+
+# --- Response compression (diet_api/middleware.py) ---
+# Responses smaller than this are sent uncompressed; br is used when the brotli package is installed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_BROTLI_QUALITY = 5 # 0-11; mid levels keep per-request CPU low for dynamic JSON
+
+# --- DietItem list cache (DietItemViewSet.list) ---
+# Serialized day lists in the default cache, keyed by the date's version token, so writes
+# invalidate them immediately; the timeout only bounds memory for dates nobody reads again.
+DIET_ITEM_LIST_CACHE_TIMEOUT = 60 * 60
+DIET_ITEM_LIST_LOCK_TIMEOUT = 10 # Seconds one request may hold the single-flight build lock for a date
+VERSION_CACHE_ALIAS = 'versions'
+# Seconds a date counts as synced with the templates. Template and date writes re-trigger the
+# sync immediately; the TTL bounds how long anything that bypasses them can go unnoticed.
+DIET_ITEM_SYNC_TTL = 10 * 60
+
+# --- Analytics (diet_api/analytics.py) ---
+# Results are also invalidated by any DietItem write in their date range
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+
+# --- Retention (manage.py archive_diet_items) ---
+# DietItems older than this many days are moved into DietDayArchive by the daily archive job
+DIET_ARCHIVE_HORIZON_DAYS = int(os.environ.get('DIET_ARCHIVE_HORIZON_DAYS', 180))
+
+
 # --- Password Validation ---
 # https://docs.djangoproject.com/en/stable/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -152,6 +261,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 # Recommended storage backend for WhiteNoise (handles compression and caching).
 STORAGES = {
+    # Uploads are stored under their content hash and deduplicated (diet_api/storage.py)
+    "default": {
+        "BACKEND": "diet_api.storage.ContentAddressedStorage",
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
@@ -164,6 +277,9 @@ MEDIA_URL = '/media/'
 # Directory where user-uploaded files will be stored IN DEVELOPMENT.
 # NOTE: This path is NOT persistent on Render's free tier filesystem.
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Unreferenced images stored or reused more recently than this are kept, since an upload in
+# flight may be reusing them; `manage.py sweep_media` deletes them later (diet_api/storage.py)
+MEDIA_DELETE_GRACE_SECONDS = int(os.environ.get('MEDIA_DELETE_GRACE_SECONDS', 10 * 60))
 
 
 # --- CORS (Cross-Origin Resource Sharing) Settings ---
@@ -175,6 +291,10 @@ CORS_ALLOWED_ORIGINS = [origin.strip() for origin in cors_origins_str.split(',')
 # It's generally safer to explicitly list origins than allow all
 CORS_ALLOW_ALL_ORIGINS = False
 
+# Let the frontend send Idempotency-Key on retried writes and see when a response was replayed
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
 # If using session/cookie-based authentication across domains, you might need this:
 # CORS_ALLOW_CREDENTIALS = True
 
@@ -14,16 +14,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+import re
+
+from django.urls import path, re_path, include
 from django.conf import settings # Import settings
-from django.conf.urls.static import static # Import static
+from diet_api.media import serve_media
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('diet_api.urls')), # Include your API app's URLs
 ]
 
-# Add media file serving during development ONLY
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# The admin is left out in API-only mode (settings.API_ONLY)
+if 'django.contrib.admin' in settings.INSTALLED_APPS:
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
+# Uploaded media is served in every environment (immutable caching, ETag, Range; see diet_api/media.py).
+# Skipped when MEDIA_URL points at another host (e.g. a CDN).
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'))
\ No newline at end of file
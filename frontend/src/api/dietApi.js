@@ -12,6 +12,27 @@ const apiClient = axios.create({
     // withCredentials: true, // Uncomment if using session auth across different origins
 });
 
+/**
+ * Generates a key for the Idempotency-Key header. Create one key per user action and
+ * pass the same key on every retry of it, so the server replays the first response
+ * instead of repeating the write.
+ */
+export const newIdempotencyKey = () => (
+    (window.crypto && window.crypto.randomUUID)
+        ? window.crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
+/**
+ * True if a failed call may not have reached the server or may succeed on retry (no
+ * response, 409 in progress, 5xx): keep the action's idempotency key for the retry.
+ * Any other response is final and stored under the key, so the next attempt needs a new one.
+ */
+export const shouldRetryWithSameKey = (error) => {
+    const status = error?.response?.status;
+    return !status || status === 409 || status >= 500;
+};
+
 // --- Diet Item (Daily Tracker) API Calls ---
 
 /** Fetches diet items for a specific date (YYYY-MM-DD). */
@@ -29,26 +50,39 @@ export const getDietItem = (id) => {
     return apiClient.get(`/diet-items/${id}/`);
 };
 
-/** Creates a new ad-hoc diet item. Handles image uploads via FormData. */
-export const addDietItem = (itemData) => {
+/** Creates a new ad-hoc diet item. Handles image uploads via FormData. Pass the action's idempotency key. */
+export const addDietItem = (itemData, idempotencyKey) => {
     const isFormData = itemData instanceof FormData;
     return apiClient.post('/diet-items/', itemData, {
-        headers: { ...(isFormData && { 'Content-Type': 'multipart/form-data' }) },
+        headers: {
+            ...(isFormData && { 'Content-Type': 'multipart/form-data' }),
+            'Idempotency-Key': idempotencyKey,
+        },
     });
 };
 
-/** Updates an existing diet item completely (PUT). Handles image uploads. */
-export const updateDietItem = (id, itemData) => {
+// Adds the item's last seen version, so the server answers 409 instead of overwriting a newer change
+const withVersion = (itemData, version) => {
+    if (version === undefined || version === null) return itemData;
+    if (itemData instanceof FormData) {
+        itemData.append('version', version);
+        return itemData;
+    }
+    return { ...itemData, version };
+};
+
+/** Updates an existing diet item completely (PUT). Handles image uploads. Pass the version the edit started from. */
+export const updateDietItem = (id, itemData, version) => {
     const isFormData = itemData instanceof FormData;
-    return apiClient.put(`/diet-items/${id}/`, itemData, {
+    return apiClient.put(`/diet-items/${id}/`, withVersion(itemData, version), {
         headers: { ...(isFormData && { 'Content-Type': 'multipart/form-data' }) },
     });
 };
 
-/** Partially updates an existing diet item (PATCH). Handles image uploads. */
-export const patchDietItem = (id, itemData) => {
+/** Partially updates an existing diet item (PATCH). Handles image uploads. Pass the version the edit started from. */
+export const patchDietItem = (id, itemData, version) => {
      const isFormData = itemData instanceof FormData;
-     return apiClient.patch(`/diet-items/${id}/`, itemData, {
+     return apiClient.patch(`/diet-items/${id}/`, withVersion(itemData, version), {
          headers: { ...(isFormData && { 'Content-Type': 'multipart/form-data' }) },
      });
 };
@@ -59,18 +93,48 @@ export const deleteDietItem = (id) => {
 };
 
 /** Marks a specific diet item as administered. */
-export const markItemAdministered = (id) => {
-    return apiClient.post(`/diet-items/${id}/mark-administered/`);
+export const markItemAdministered = (id, idempotencyKey) => {
+    return apiClient.post(`/diet-items/${id}/mark-administered/`, null, {
+        headers: { 'Idempotency-Key': idempotencyKey },
+    });
 };
 
 /** Marks a specific diet item as skipped. */
-export const markItemSkipped = (id) => {
-    return apiClient.post(`/diet-items/${id}/mark-skipped/`);
+export const markItemSkipped = (id, idempotencyKey) => {
+    return apiClient.post(`/diet-items/${id}/mark-skipped/`, null, {
+        headers: { 'Idempotency-Key': idempotencyKey },
+    });
 };
 
 /** Resets the status of a specific diet item to pending. */
-export const markItemPending = (id) => {
-    return apiClient.post(`/diet-items/${id}/mark-pending/`);
+export const markItemPending = (id, idempotencyKey) => {
+    return apiClient.post(`/diet-items/${id}/mark-pending/`, null, {
+        headers: { 'Idempotency-Key': idempotencyKey },
+    });
+};
+
+/**
+ * Copies all items of a day (span 'day') or week (span 'week') starting at sourceDate
+ * onto each of targetDates, reset to pending. Existing (timing, name) slots and template items are skipped by default.
+ */
+export const copyDietItems = ({ sourceDate, targetDates, span = 'day', skipExisting = true }, idempotencyKey) => {
+    return apiClient.post('/diet-items/copy/', {
+        source_date: sourceDate,
+        target_dates: targetDates,
+        span,
+        skip_existing: skipExisting,
+    }, { headers: { 'Idempotency-Key': idempotencyKey } });
+};
+
+/**
+ * Flushes queued offline edits in one request. Each mutation is
+ * { op: 'create'|'patch'|'delete'|'status', id | ref, version, data, status }.
+ * Send the item's last seen `version` so newer server changes come back as conflicts.
+ */
+export const batchMutateDietItems = (mutations, idempotencyKey) => {
+    return apiClient.post('/diet-items/batch/', { mutations }, {
+        headers: { 'Idempotency-Key': idempotencyKey },
+    });
 };
 
 // --- REMOVED resetDayToTemplate function ---
@@ -81,6 +145,8 @@ export const getFoodFormulas = () => apiClient.get('/food-formulas/');
 export const addFoodFormula = (formulaData) => apiClient.post('/food-formulas/', formulaData);
 export const updateFoodFormula = (id, formulaData) => apiClient.put(`/food-formulas/${id}/`, formulaData);
 export const deleteFoodFormula = (id) => apiClient.delete(`/food-formulas/${id}/`);
+// Ranked prefix + typo-tolerant search by name
+export const searchFoodFormulas = (q, limit = 10) => apiClient.get('/food-formulas/search/', { params: { q, limit } });
 
 // --- Schedule Template API Calls ---
 export const getScheduleTemplates = () => apiClient.get('/schedule-templates/');
@@ -88,3 +154,19 @@ export const addScheduleTemplate = (templateData) => apiClient.post('/schedule-t
 export const updateScheduleTemplate = (id, templateData) => apiClient.put(`/schedule-templates/${id}/`, templateData);
 export const deleteScheduleTemplate = (id) => apiClient.delete(`/schedule-templates/${id}/`);
 
+
+/**
+ * Dry-run of the daily template sync over a date range (defaults: today + 30 days).
+ * Pass templateData to preview a new template, or id + templateData to preview an edit.
+ */
+export const previewScheduleSync = ({ id, templateData, start, end } = {}) => {
+    const params = { ...(start && { start }), ...(end && { end }) };
+    const url = id ? `/schedule-templates/${id}/sync-preview/` : '/schedule-templates/sync-preview/';
+    return templateData
+        ? apiClient.post(url, templateData, { params })
+        : apiClient.get(url, { params });
+};
+
+// --- Analytics API Calls ---
+/** Nutrient/adherence trends. params: { start, end, bucket: 'day'|'week'|'month', window } */
+export const getNutritionTrends = (params = {}) => apiClient.get('/analytics/nutrition/', { params });
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { addDietItem, updateDietItem } from '../api/dietApi';
+import { addDietItem, updateDietItem, newIdempotencyKey, shouldRetryWithSameKey } from '../api/dietApi';
 // Ensure all necessary MUI components are imported
 import {
     TextField, Button, Grid, Box, Typography, CircularProgress, Alert, Autocomplete, Paper
@@ -33,6 +33,8 @@ function DietForm({ refreshItems, selectedItem, clearSelection, currentViewDate,
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
     const fileInputRef = useRef(null);
+    // One Idempotency-Key per add: reused when resubmitting after a lost response, so the item isn't created twice
+    const idempotencyKeyRef = useRef(null);
     // Combine external disable flag with internal loading state
     const formDisabled = isDisabled || loading;
 
@@ -58,6 +60,7 @@ function DietForm({ refreshItems, selectedItem, clearSelection, currentViewDate,
             setScheduledDate(formatDate(currentViewDate));
         }
         setError(null); // Clear error on mode change
+        idempotencyKeyRef.current = null;
     }, [selectedItem, currentViewDate]);
 
     // Effect to auto-fill from formula when adding
@@ -108,22 +111,28 @@ function DietForm({ refreshItems, selectedItem, clearSelection, currentViewDate,
         if (image) { formData.append('image', image); } else if (isEditing && !imagePreview) { formData.append('image', ''); }
 
         try {
-            if (isEditing && selectedItem?.id) { await updateDietItem(selectedItem.id, formData); }
-            else if (!isEditing) { await addDietItem(formData); }
+            if (isEditing && selectedItem?.id) { await updateDietItem(selectedItem.id, formData, selectedItem.version); }
+            else if (!isEditing) {
+                if (!idempotencyKeyRef.current) idempotencyKeyRef.current = newIdempotencyKey();
+                await addDietItem(formData, idempotencyKeyRef.current);
+            }
             else { throw new Error("Cannot update item without an ID."); }
+            idempotencyKeyRef.current = null;
             refreshItems(); clearSelection(); resetFormFields();
             if (onCloseForm) onCloseForm(); // Close form on success
         } catch (error) {
+            if (!shouldRetryWithSameKey(error)) idempotencyKeyRef.current = null;
             console.error("Error submitting form:", error.response?.data || error.message);
              const backendError = error.response?.data;
-            if (typeof backendError === 'object' && backendError !== null) { setError(Object.entries(backendError).map(([key, value]) => `${key}: ${value.join ? value.join(', ') : value}`).join('; ')); }
+            if (error.response?.status === 409) { setError("This item was changed by someone else since you opened it. Cancel, reload the list and edit it again."); }
+            else if (typeof backendError === 'object' && backendError !== null) { setError(Object.entries(backendError).map(([key, value]) => `${key}: ${value.join ? value.join(', ') : value}`).join('; ')); }
             else { setError(`Failed to ${isEditing ? 'update' : 'add'} item.`); }
         } finally { setLoading(false); }
     };
 
     // --- Handle Cancel ---
     const handleCancel = () => {
-        clearSelection(); resetFormFields();
+        clearSelection(); resetFormFields(); idempotencyKeyRef.current = null;
         if (onCloseForm) onCloseForm(); // Close form on cancel
     }
 
@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 // Import all necessary API calls for status changes
-import { markItemAdministered, markItemSkipped, markItemPending } from '../api/dietApi';
+import { markItemAdministered, markItemSkipped, markItemPending, newIdempotencyKey, shouldRetryWithSameKey } from '../api/dietApi';
 // Removed deleteDietItem import
 
 // MUI Components
@@ -30,6 +30,10 @@ function DietListItem({ item, refreshItems, onEdit, isDisabled, isEditMode }) {
     const [actionLoading, setActionLoading] = useState(false);
     // Buttons disabled if parent is loading OR if not in edit mode OR if this item's action is loading
     const buttonsDisabled = isDisabled || !isEditMode || actionLoading;
+    // Archived days are served read-only: their items no longer exist on the server
+    const showActions = isEditMode && !item.archived;
+    // Idempotency-Key of the last status action, kept while it may need a retry so a lost response doesn't apply it twice
+    const pendingActionRef = useRef({ name: null, key: null });
 
     // Log item rendering (optional for debugging)
     useEffect(() => {
@@ -45,12 +49,17 @@ function DietListItem({ item, refreshItems, onEdit, isDisabled, isEditMode }) {
             return;
         }
         setActionLoading(true);
+        if (pendingActionRef.current.name !== actionName) {
+            pendingActionRef.current = { name: actionName, key: newIdempotencyKey() };
+        }
         try {
-            await actionFn(itemId); // Call the API function
+            await actionFn(itemId, pendingActionRef.current.key); // Call the API function
+            pendingActionRef.current = { name: null, key: null };
             console.log(`HANDLE ACTION: API call ${actionFn.name} successful for ID: ${itemId}. Refreshing items...`);
             refreshItems(); // Refresh the list in the parent component
         } catch (error) {
             console.error(`HANDLE ACTION ERROR (${actionName}, ID: ${itemId}):`, error.response?.data || error.message || error);
+            if (!shouldRetryWithSameKey(error)) pendingActionRef.current = { name: null, key: null };
             if (error.response?.status === 404) {
                  alert(`${actionName} failed. Item with ID ${itemId} not found on server. The list might be out of sync.`);
             } else {
@@ -144,6 +153,7 @@ function DietListItem({ item, refreshItems, onEdit, isDisabled, isEditMode }) {
                          {/* Status Chip and Administered Time */}
                          <Box sx={{ mt: 1 }}>
                             {statusChip}
+                            {item.archived && <Chip label="Archived" size="small" variant="outlined" sx={{ ml: 1 }} />}
                             {item.is_administered && item.administered_at && (
                                 <Typography variant="caption" color="text.secondary" sx={{ml: 1}}>
                                     ({new Date(item.administered_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })})
@@ -153,8 +163,8 @@ function DietListItem({ item, refreshItems, onEdit, isDisabled, isEditMode }) {
                     </>
                 }
             />
-            {/* Action Buttons Area - Renders only if isEditMode is true */}
-            {isEditMode && (
+            {/* Action Buttons Area - Renders only in edit mode, for items that still exist (not archived) */}
+            {showActions && (
                 <Box sx={{ display: 'flex', flexDirection: 'column', gap: 0.5, ml: 1, flexShrink: 0 }}>
                     {/* Show loading spinner if an action is in progress */}
                     {actionLoading ? (